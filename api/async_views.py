@@ -0,0 +1,173 @@
+"""Асинхронные view для чтения каталога, заказов и входа под ASGI"""
+import json
+from django.contrib.auth import aauthenticate
+from django.http import Http404, HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from courses.models import Course, Lesson
+from students.models import Enrollment
+from students.payments import ahandle_payment_webhook
+from .authentication import CachedBearerTokenAuthentication
+from .cache import catalog_cache
+from .conditional import acatalog_version, acourse_version, is_not_modified, make_etag
+from .exceptions import custom_exception_handler
+from .metrics import timed
+from .pagination import CustomCursorPagination
+from .statuses import aenrollment_statuses, add_statuses, statuses_version, wants_statuses
+from .fast_serializers import FastCourseSerializer, FastEnrollmentSerializer, FastLessonSerializer
+
+
+class AsyncAPIView(View):
+    """Базовый async view: токен-аутентификация и ответы в формате API"""
+    authentication = CachedBearerTokenAuthentication()
+    require_auth = True
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.api_user = None
+            if self.require_auth:
+                result = await self.authentication.aauthenticate(request)
+                if result is None:
+                    raise NotAuthenticated()
+                request.api_user = result[0]
+            return await super().dispatch(request, *args, **kwargs)
+        except (APIException, Http404) as exc:
+            return self.handle_exception(exc)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, AuthenticationFailed):
+            exc.auth_header = self.authentication.authenticate_header(None)
+        response = custom_exception_handler(exc, {})
+        headers = {k: v for k, v in response.items() if k.lower() != 'content-type'}
+        return self.render(response.data, response.status_code, headers=headers)
+
+    def render(self, data=None, status_code=200, headers=None):
+        with timed('render'):
+            content = self.renderer.render(data) if data is not None else b''
+        return HttpResponse(content, status=status_code, headers=headers, content_type='application/json')
+
+    def parse_body(self, request):
+        """Тело запроса в JSON или как форма"""
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                raise ParseError()
+        else:
+            data = request.POST
+        if not hasattr(data, 'get'):
+            raise ParseError()
+        return data
+
+    def not_modified(self, etag):
+        return self.render(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+class AsyncCourseListView(AsyncAPIView):
+    """Список курсов (async-версия CourseViewSet.list)"""
+    query_budget = 4
+    read_replica = True
+
+    async def get(self, request):
+        api_request = Request(request)
+        version = await acatalog_version()
+        statuses = await aenrollment_statuses(request.api_user) if wants_statuses(api_request) else None
+        page_etag = make_etag(api_request, version)
+        etag = page_etag if statuses is None else make_etag(api_request, version, statuses_version(statuses))
+        if is_not_modified(api_request, etag):
+            return self.not_modified(etag)
+
+        cached = await catalog_cache.aget_page(api_request)
+        cache_status = 'hit'
+        if cached is None or cached['etag'] != page_etag:
+            cache_status = 'miss'
+            paginator = CustomCursorPagination()
+            queryset = FastCourseSerializer.values(Course.objects.all())
+            page = await paginator.apaginate_queryset(queryset, api_request)
+            data = FastCourseSerializer(page, many=True, context={'request': api_request}).data
+            cached = {'etag': page_etag, 'body': paginator.get_paginated_response(data).data}
+            await catalog_cache.aset_page(api_request, cached)
+        body = cached['body'] if statuses is None else add_statuses(cached['body'], statuses)
+        return self.render(body, headers={'X-Catalog-Cache': cache_status, 'ETag': etag})
+
+
+class AsyncCourseDetailView(AsyncAPIView):
+    """Уроки курса (async-версия CourseViewSet.retrieve)"""
+    query_budget = 3
+    read_replica = True
+
+    async def get(self, request, pk):
+        api_request = Request(request)
+        version = str(await acourse_version(pk))
+        etag = make_etag(api_request, pk, version)
+        if is_not_modified(api_request, etag):
+            return self.not_modified(etag)
+
+        cached = await catalog_cache.aget_course(pk)
+        cache_status = 'hit'
+        if cached is None or cached['version'] != version:
+            cache_status = 'miss'
+            queryset = FastLessonSerializer.values(Lesson.objects.filter(course_id=pk).order_by('pk'))
+            lessons = [lesson async for lesson in queryset]
+            cached = {'version': version, 'body': {"data": FastLessonSerializer(lessons, many=True).data}}
+            await catalog_cache.aset_course(pk, cached)
+        return self.render(cached['body'], headers={'X-Catalog-Cache': cache_status, 'ETag': etag})
+
+
+class AsyncOrdersView(AsyncAPIView):
+    """Заказы текущего пользователя (async-версия MyOrdersView)"""
+    query_budget = 2
+    read_replica = True
+
+    async def get(self, request):
+        queryset = FastEnrollmentSerializer.values(Enrollment.objects.for_listing().filter(user=request.api_user))
+        enrollments = [enrollment async for enrollment in queryset]
+        serializer = FastEnrollmentSerializer(enrollments, many=True, context={'request': Request(request)})
+        return self.render({"data": serializer.data})
+
+
+class AsyncPaymentWebhookView(AsyncAPIView):
+    """Вебхук оплаты (async-версия PaymentWebhookView)"""
+    require_auth = False
+    query_budget = 1
+
+    async def post(self, request):
+        data = self.parse_body(request)
+        await ahandle_payment_webhook(data.get('order_id'), data.get('status'))
+        return self.render(status_code=status.HTTP_204_NO_CONTENT)
+
+
+class AsyncAuthView(AsyncAPIView):
+    """Авторизация (async-версия AuthView)"""
+    require_auth = False
+    query_budget = 5
+
+    async def post(self, request):
+        data = self.parse_body(request)
+        email = data.get('email')
+        password = data.get('password')
+
+        if not email or not password:
+            return self.render({
+                "message": "Invalid data",
+                "errors": {"email": ["Invalid data"]}
+            }, 422)
+
+        user = await aauthenticate(request, username=email, password=password)
+        if user:
+            token, _ = await Token.objects.aget_or_create(user=user)
+            return self.render({"token": token.key})
+        return self.render({
+            "message": "Invalid data",
+            "errors": {"email": ["Invalid credentials"]}
+        }, 422)
@@ -1,5 +1,139 @@
-from rest_framework.authentication import TokenAuthentication
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
 
 class BearerTokenAuthentication(TokenAuthentication):
     """аутентификация по токену"""
-    keyword = 'Bearer'
\ No newline at end of file
+    keyword = 'Bearer'
+
+
+class TokenCache:
+    """Ограниченный LRU-кеш токен -> пользователь с временем жизни записей
+
+    Кеш живет в памяти процесса, lock держится только на время операции со
+    словарем, поэтому async-код вызывает его напрямую, без потоков.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def max_size(self):
+        return self._max_size or getattr(settings, 'TOKEN_AUTH_CACHE', {}).get('MAX_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return self._ttl or getattr(settings, 'TOKEN_AUTH_CACHE', {}).get('TTL', 300)
+
+    def reset_stats(self):
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def stats(self):
+        """Статистика кеша, включая долю попаданий"""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), max_size=self.max_size)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0], entry[1]
+
+    def put(self, key, user, token):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (user, token, time.monotonic() + self.ttl)
+            self._user_keys.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        user, _, _ = self._entries.pop(key)
+        keys = self._user_keys.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user.pk]
+
+    def invalidate_token(self, key):
+        """Удаляет запись токена"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def invalidate_user(self, user_id):
+        """Удаляет все токены пользователя"""
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedBearerTokenAuthentication(BearerTokenAuthentication):
+    """аутентификация по токену с кешем в памяти процесса
+
+    Записи сбрасываются сигналами при удалении токена и изменении
+    пользователя; изменения из других процессов видны через TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.put(key, user, token)
+        return user, token
+
+    async def aauthenticate(self, request):
+        """Асинхронная аутентификация для async view (async ORM вместо потоков)"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        token_cache.put(key, token.user, token)
+        return token.user, token
@@ -0,0 +1,371 @@
+"""Кеш каталога курсов"""
+import fnmatch
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+DEFAULT_CATALOG_CACHE = {
+    'BACKEND': 'api.cache.LocMemBackend',
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'catalog',
+    'OPTIONS': {},
+}
+
+
+class BaseCacheBackend:
+    """Базовый бэкенд кеша каталога"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, timeout):
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+    def incr(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocMemBackend(BaseCacheBackend):
+    """Кеш в памяти процесса"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, timeout):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.max_entries:
+                self._cull()
+            self._data[key] = (value, expires)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (b'0', None))
+            value = str(int(value) + 1).encode()
+            self._data[key] = (value, expires)
+            return int(value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _cull(self):
+        """Удаляет просроченные записи, а при их отсутствии - самые старые"""
+        now = time.monotonic()
+        expired = [k for k, (_, exp) in self._data.items() if exp is not None and exp < now]
+        for key in expired:
+            del self._data[key]
+        if len(self._data) >= self.max_entries:
+            for key in list(self._data)[:max(1, self.max_entries // 10)]:
+                del self._data[key]
+
+
+class FileBackend(BaseCacheBackend):
+    """Кеш в файлах, общий для процессов на одной машине"""
+
+    def __init__(self, location):
+        self.location = Path(location)
+        self.location.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.location / (hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires = float(f.readline())
+                if expires and expires < time.time():
+                    return None
+                return f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set(self, key, value, timeout):
+        expires = time.time() + timeout if timeout else 0
+        fd, tmp = tempfile.mkstemp(dir=self.location)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(f'{expires}\n'.encode())
+            f.write(value)
+        os.replace(tmp, self._path(key))
+
+    def delete(self, *keys):
+        for key in keys:
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self.get(key) or 0) + 1
+            self.set(key, str(value).encode(), None)
+            return value
+
+    def clear(self):
+        for path in self.location.glob('*.cache'):
+            path.unlink(missing_ok=True)
+
+
+class RedisBackend(BaseCacheBackend):
+    """Кеш в Redis или в любом клиенте с тем же интерфейсом"""
+
+    def __init__(self, url=None, client=None, key_prefix='catalog'):
+        if client is not None:
+            self.client = import_string(client)() if isinstance(client, str) else client
+        else:
+            import redis
+            self.client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, timeout):
+        self.client.set(key, value, ex=timeout or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f'{self.key_prefix}:*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class InMemoryRedis:
+    """Локальная заглушка клиента Redis для разработки и тестов"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            item = self._data.get(name)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            value, expires = self._data.get(name, (b'0', None))
+            value = int(value) + amount
+            self._data[name] = (str(value).encode(), expires)
+            return value
+
+    def scan_iter(self, match=None):
+        with self._lock:
+            names = list(self._data)
+        return (name for name in names if match is None or fnmatch.fnmatchcase(name, match))
+
+
+class CatalogCache:
+    """Read-through кеш страниц каталога и уроков отдельных курсов"""
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def config(self):
+        return {**DEFAULT_CATALOG_CACHE, **getattr(settings, 'CATALOG_CACHE', {})}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            config = self.config
+            backend_class = import_string(config['BACKEND'])
+            options = config['OPTIONS']
+            if issubclass(backend_class, RedisBackend):
+                # clear() удаляет ключи по тому же префиксу, что и _key()
+                options = {'key_prefix': config['KEY_PREFIX'], **options}
+            self._backend = backend_class(**options)
+        return self._backend
+
+    def reset(self):
+        """Сбрасывает бэкенд (например, после изменения настроек)"""
+        self._backend = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0}
+
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _key(self, *parts):
+        return ':'.join([self.config['KEY_PREFIX'], *map(str, parts)])
+
+    def _get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(value)
+
+    def _set(self, key, data):
+        value = json.dumps(data, cls=JSONEncoder, ensure_ascii=False).encode()
+        self.backend.set(key, value, self.config['TIMEOUT'])
+        self._count('sets')
+
+    def _page_key(self, request):
+        version = int(self.backend.get(self._key('version')) or 0)
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        raw = f'{request.scheme}://{request.get_host()}{request.path}?{params}'
+        return self._key('page', version, hashlib.sha1(raw.encode()).hexdigest())
+
+    def get_page(self, request):
+        """Страница списка курсов (ключ учитывает хост и параметры запроса)"""
+        return self._get(self._page_key(request))
+
+    def set_page(self, request, data):
+        self._set(self._page_key(request), data)
+
+    def get_course(self, pk):
+        """Уроки курса"""
+        return self._get(self._key('course', pk))
+
+    def set_course(self, pk, data):
+        self._set(self._key('course', pk), data)
+
+    # Async-варианты для async view: бэкенд (файлы, Redis) блокирует,
+    # поэтому обращения к нему выполняются в пуле потоков.
+
+    async def aget_page(self, request):
+        return await sync_to_async(self.get_page, thread_sensitive=False)(request)
+
+    async def aset_page(self, request, data):
+        await sync_to_async(self.set_page, thread_sensitive=False)(request, data)
+
+    async def aget_course(self, pk):
+        return await sync_to_async(self.get_course, thread_sensitive=False)(pk)
+
+    async def aset_course(self, pk, data):
+        await sync_to_async(self.set_course, thread_sensitive=False)(pk, data)
+
+    def invalidate_course(self, pk):
+        """Сбрасывает запись курса и все страницы каталога"""
+        self.backend.delete(self._key('course', pk))
+        self.backend.incr(self._key('version'))
+        self._count('invalidations')
+
+    def invalidate_lessons(self, course_id):
+        """Сбрасывает только запись курса: уроки не выводятся в списке"""
+        self.backend.delete(self._key('course', course_id))
+        self._count('invalidations')
+
+    def statuses_generation(self, user_id):
+        """Поколение статусов студента: растет при каждом сбросе"""
+        return int(self.backend.get(self._key('statuses', user_id)) or 0)
+
+    def get_statuses(self, user_id, generation):
+        """Статусы записей студента по курсам для данного поколения"""
+        return self._get(self._key('statuses', user_id, generation))
+
+    def set_statuses(self, user_id, generation, data):
+        """Сохраняет статусы под поколением, прочитанным до запроса к БД.
+
+        Если сброс случился между чтением БД и записью, данные лягут под
+        устаревшее поколение и читаться больше не будут.
+        """
+        self._set(self._key('statuses', user_id, generation), data)
+
+    def invalidate_statuses(self, *user_ids):
+        """Сбрасывает статусы записей студентов"""
+        for user_id in user_ids:
+            self.backend.delete(self._key('statuses', user_id, self.statuses_generation(user_id)))
+            self.backend.incr(self._key('statuses', user_id))
+        if user_ids:
+            self._count('invalidations')
+
+    async def astatuses_generation(self, user_id):
+        return await sync_to_async(self.statuses_generation, thread_sensitive=False)(user_id)
+
+    async def aget_statuses(self, user_id, generation):
+        return await sync_to_async(self.get_statuses, thread_sensitive=False)(user_id, generation)
+
+    async def aset_statuses(self, user_id, generation, data):
+        await sync_to_async(self.set_statuses, thread_sensitive=False)(user_id, generation, data)
+
+    def mark_sticky(self, user_id, seconds):
+        """Отмечает пользователя, который seconds секунд читает с основной БД (api.routing)"""
+        self.backend.set(self._key('sticky', user_id), b'1', seconds)
+
+    def is_sticky(self, user_id):
+        return self.backend.get(self._key('sticky', user_id)) is not None
+
+    def clear(self):
+        self.backend.clear()
+
+
+catalog_cache = CatalogCache()
+
+
+@receiver(setting_changed)
+def reset_catalog_cache(setting, **kwargs):
+    if setting == 'CATALOG_CACHE':
+        catalog_cache.reset()
@@ -0,0 +1,51 @@
+"""Условные GET-запросы по версиям курсов (ETag / If-None-Match)"""
+import hashlib
+from urllib.parse import urlencode
+from django.http import Http404
+from django.utils.http import parse_etags, quote_etag
+from courses.models import CatalogVersion, Course
+
+
+def catalog_version():
+    """Версия каталога (один запрос по первичному ключу)"""
+    return CatalogVersion.current()
+
+
+async def acatalog_version():
+    """Асинхронный вариант catalog_version"""
+    return await CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).afirst() or 0
+
+
+def course_version(pk):
+    """Версия курса (один запрос по первичному ключу)"""
+    try:
+        updated = Course.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    except (TypeError, ValueError):
+        updated = None
+    if updated is None:
+        raise Http404
+    return updated
+
+
+async def acourse_version(pk):
+    """Асинхронный вариант course_version"""
+    updated = await Course.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+    if updated is None:
+        raise Http404
+    return updated
+
+
+def make_etag(request, *version):
+    """ETag ответа: версия данных плюс всё, от чего зависит тело ответа"""
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    raw = '|'.join([request.scheme, request.get_host(), request.path, params, *map(str, version)])
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def is_not_modified(request, etag):
+    """Совпадает ли ETag с заголовком If-None-Match (слабое сравнение)"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in (tag.removeprefix('W/') for tag in etags)
@@ -0,0 +1,243 @@
+"""Потоковый импорт и экспорт курсов, уроков и записей в CSV/JSONL.
+
+Строки читаются и пишутся по одной, в БД они попадают пачками:
+каждая пачка сохраняется одним bulk_create (upsert) в своей транзакции,
+поэтому память не зависит от размера файла.
+"""
+import csv
+import datetime
+import decimal
+import json
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from courses.images import submit_course_image
+from courses.models import MAX_LESSONS, CatalogVersion, Course, Lesson
+from courses.search import index_courses
+from students.models import Enrollment
+from students.signals import enrollments_changed
+from users.models import User
+
+FORMATS = ('csv', 'jsonl')
+
+
+class DataImportError(Exception):
+    """Ошибка в импортируемых данных"""
+
+
+def detect_format(path, fmt=None):
+    """Формат из параметра или по расширению файла"""
+    fmt = fmt or path.rsplit('.', 1)[-1].lower()
+    if fmt not in FORMATS:
+        raise DataImportError(f'Неизвестный формат: {fmt}')
+    return fmt
+
+
+def read_rows(stream, fmt):
+    """Строки файла в виде словарей, по одной"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _to_text(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def write_rows(stream, fmt, columns, rows):
+    """Пишет кортежи значений в файл, возвращает число строк"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(['' if value is None else _to_text(value) for value in row])
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(dict(zip(columns, map(_to_text, row))), ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+class Dataset:
+    """Описание импорта и экспорта одной модели"""
+    model = None
+    # Колонка файла -> поле для values_list при экспорте.
+    columns = {}
+    unique_fields = ['id']
+    update_fields = []
+    skip_validation = ()
+
+    def export_rows(self, chunk_size):
+        queryset = self.model.objects.order_by('pk').values_list(*self.columns.values())
+        return queryset.iterator(chunk_size=chunk_size)
+
+    def build(self, row, number):
+        """Объект модели из строки файла с проверкой полей"""
+        obj = self.model()
+        for column in self.columns:
+            if row.get(column) is None:
+                continue
+            field = self.model._meta.get_field(column)
+            value = row[column]
+            try:
+                if value == '' and field.null:
+                    value = None
+                elif field.is_relation:
+                    value = field.target_field.to_python(value)
+                else:
+                    value = field.to_python(value)
+            except ValidationError as exc:
+                raise DataImportError(f'Строка {number}, поле {column}: {"; ".join(exc.messages)}')
+            setattr(obj, field.attname, value)
+        self.validate(obj, number)
+        return obj
+
+    def validate(self, obj, number):
+        exclude = [f.name for f in self.model._meta.fields if f.is_relation] + list(self.skip_validation)
+        try:
+            obj.clean_fields(exclude=exclude)
+        except ValidationError as exc:
+            errors = '; '.join(f'{name}: {" ".join(messages)}' for name, messages in exc.message_dict.items())
+            raise DataImportError(f'Строка {number}: {errors}')
+
+    def save(self, objs):
+        """Сохраняет пачку внутри транзакции"""
+        self.model.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=self.unique_fields, update_fields=self.update_fields,
+        )
+
+    def committed(self, objs, options):
+        """Действия после фиксации пачки"""
+
+
+class CourseDataset(Dataset):
+    model = Course
+    columns = {
+        'id': 'id', 'name': 'name', 'description': 'description', 'hours': 'hours', 'price': 'price',
+        'start_date': 'start_date', 'end_date': 'end_date', 'img': 'img',
+    }
+    update_fields = ['name', 'description', 'hours', 'price', 'start_date', 'end_date', 'img', 'updated_at']
+    skip_validation = ('img',)
+
+    def save(self, objs):
+        previous = dict(Course.objects.filter(pk__in=[o.pk for o in objs if o.pk]).values_list('pk', 'img'))
+        super().save(objs)
+        self.changed_images = [o for o in objs if o.img and previous.get(o.pk) != o.img.name]
+        Course.objects.filter(pk__in=[o.pk for o in self.changed_images]).update(img_variants={})
+        index_courses(o.pk for o in objs if o.pk)
+        CatalogVersion.bump()
+
+    def committed(self, objs, options):
+        if options.get('images', True):
+            futures = [submit_course_image(o.pk, o.img.name) for o in self.changed_images]
+            options.setdefault('futures', []).extend(f for f in futures if f is not None)
+
+
+class LessonDataset(Dataset):
+    model = Lesson
+    columns = {
+        'id': 'id', 'course': 'course_id', 'name': 'name', 'text_content': 'text_content',
+        'video_link': 'video_link', 'hours': 'hours',
+    }
+    update_fields = ['course', 'name', 'text_content', 'video_link', 'hours']
+
+    def save(self, objs):
+        previous = Lesson.objects.filter(pk__in=[o.pk for o in objs if o.pk]).values_list('course_id', flat=True)
+        course_ids = {o.course_id for o in objs} | set(previous)
+        courses = Course.objects.filter(pk__in=course_ids)
+        super().save(objs)
+        # bulk_create не шлет сигналы: счетчики, индекс поиска и версии обновляются здесь.
+        Course.rebuild_lesson_counters(courses)
+        over_limit = list(courses.filter(lesson_count__gt=MAX_LESSONS).values_list('pk', flat=True))
+        if over_limit:
+            raise DataImportError(f'Больше {MAX_LESSONS} уроков у курсов: {over_limit}')
+        courses.update(updated_at=timezone.now())
+        index_courses(course_ids)
+        CatalogVersion.bump()
+
+
+class EnrollmentDataset(Dataset):
+    model = Enrollment
+    columns = {
+        'user': 'user__email', 'course': 'course_id', 'date': 'date', 'status': 'status',
+        'order_id': 'order_id', 'certificate_number': 'certificate_number',
+    }
+    unique_fields = ['user', 'course']
+    update_fields = ['status', 'order_id', 'certificate_number']
+
+    def build(self, row, number):
+        email = row.get('user')
+        row = {**row, 'user': None}
+        obj = super().build(row, number)
+        if not email:
+            raise DataImportError(f'Строка {number}: не указан email студента')
+        obj._email = User.objects.normalize_email(email)
+        return obj
+
+    def save(self, objs):
+        users = dict(User.objects.filter(email__in={o._email for o in objs}).values_list('email', 'pk'))
+        missing = sorted({o._email for o in objs} - set(users))
+        if missing:
+            raise DataImportError(f'Нет студентов: {", ".join(missing)}')
+        dated = []
+        for obj in objs:
+            obj.user_id = users[obj._email]
+            if obj.date:
+                dated.append((obj, obj.date))
+        super().save(objs)
+        # date заполняется auto_now_add при вставке, дату из файла возвращаем отдельно.
+        for obj, date in dated:
+            obj.date = date
+        Enrollment.objects.bulk_update([obj for obj, _ in dated], ['date'], batch_size=len(objs))
+        enrollments_changed.send(Enrollment, user_ids=users.values())
+
+
+DATASETS = {
+    'courses': CourseDataset,
+    'lessons': LessonDataset,
+    'enrollments': EnrollmentDataset,
+}
+
+
+def import_rows(name, rows, batch_size=500, images=True):
+    """Импортирует строки пачками, возвращает число строк.
+
+    Каждая пачка сохраняется в отдельной транзакции; при ошибке уже
+    сохраненные пачки остаются в БД. Обложки курсов обрабатываются в
+    пуле courses.images, функция дожидается окончания обработки.
+    """
+    dataset = DATASETS[name]()
+    options = {'images': images}
+    rows = iter(rows)
+    total = 0
+    try:
+        while chunk := list(islice(rows, batch_size)):
+            objs = [dataset.build(row, total + i + 1) for i, row in enumerate(chunk)]
+            try:
+                with transaction.atomic():
+                    dataset.save(objs)
+            except IntegrityError as exc:
+                raise DataImportError(f'Строки {total + 1}-{total + len(objs)}: {exc}')
+            dataset.committed(objs, options)
+            total += len(objs)
+            options['futures'] = [f for f in options.get('futures', []) if not f.done()]
+    finally:
+        for future in options.get('futures', []):
+            future.result()
+    return total
+
+
+def export_rows(name, stream, fmt, chunk_size=2000):
+    """Выгружает модель в файл, возвращает число строк"""
+    dataset = DATASETS[name]()
+    return write_rows(stream, fmt, list(dataset.columns), dataset.export_rows(chunk_size))
@@ -1,8 +1,16 @@
 from rest_framework.views import exception_handler
-from rest_framework.exceptions import ValidationError, PermissionDenied, NotAuthenticated
+from rest_framework.exceptions import APIException, ValidationError, PermissionDenied, NotAuthenticated
 from rest_framework import status
 from rest_framework.response import Response
 
+
+class ServiceUnavailable(APIException):
+    """сервис перегружен, запрос стоит повторить позже"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Service temporarily unavailable, try again later.'
+    default_code = 'service_unavailable'
+
+
 def custom_exception_handler(exc, context):
     """обработчик исключений"""
     response = exception_handler(exc, context)
@@ -17,4 +25,7 @@ def custom_exception_handler(exc, context):
     if isinstance(exc, (PermissionDenied, NotAuthenticated)):
         return Response({"message": "Forbidden for you"}, status=403)
 
+    if isinstance(exc, ServiceUnavailable):
+        return Response({"message": "Service unavailable"}, status=503, headers={"Retry-After": "1"})
+
     return response
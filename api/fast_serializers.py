@@ -0,0 +1,167 @@
+"""Быстрые read-only сериализаторы для горячих путей чтения.
+
+Повторяют вывод CourseSerializer, LessonSerializer и EnrollmentSerializer
+байт в байт, но без полей DRF: функции доступа и форматирования
+собираются один раз на сериализатор. Принимают как объекты моделей,
+так и строки ``.values()`` (см. ``values()``), что избавляет от
+создания экземпляров моделей.
+
+Интерфейс совпадает с DRF: ``FastCourseSerializer(page, many=True, context=...).data``.
+"""
+import decimal
+from operator import attrgetter, itemgetter
+from rest_framework.settings import api_settings
+from courses.models import Course
+from .metrics import timed
+from .serializers import course_image_url
+
+
+def date_formatter(fmt):
+    return lambda value: value.strftime(fmt)
+
+
+def decimal_formatter(model_field):
+    """Форматирование как у DRF DecimalField (COERCE_DECIMAL_TO_STRING)"""
+    exponent = decimal.Decimal('.1') ** model_field.decimal_places
+    context = decimal.Context(prec=model_field.max_digits)
+
+    def format_decimal(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        value = value.quantize(exponent, context=context)
+        return '{:f}'.format(value) if api_settings.COERCE_DECIMAL_TO_STRING else value
+    return format_decimal
+
+
+class FastSerializer:
+    """Базовый сериализатор на заранее собранных функциях доступа.
+
+    ``fields`` - кортеж (ключ, источник, преобразование); преобразование -
+    функция значения, класс вложенного сериализатора или имя метода,
+    получающего весь объект. Как и в DRF, None отдается без преобразования.
+    """
+    fields = ()
+    # Поля .values(), которые нужны методам помимо источников из fields.
+    method_sources = {}
+
+    def __init__(self, instance=None, many=False, context=None, prefix=''):
+        self.instance = instance
+        self.many = many
+        self.context = {} if context is None else context
+        self.prefix = prefix
+        self._compiled = {}
+
+    @classmethod
+    def value_names(cls, prefix=''):
+        """Имена полей для ``QuerySet.values()``"""
+        names = []
+        for key, source, convert in cls.fields:
+            if isinstance(convert, type) and issubclass(convert, FastSerializer):
+                names += convert.value_names(f'{prefix}{source}__')
+            elif isinstance(convert, str):
+                names += [prefix + name for name in cls.method_sources[convert]]
+            else:
+                names.append(prefix + source)
+        return names
+
+    @classmethod
+    def values(cls, queryset):
+        """Выборка строк-словарей со всеми нужными сериализатору полями"""
+        return queryset.values(*cls.value_names())
+
+    def getter(self, name, rows):
+        """Функция доступа к полю объекта или строки .values()"""
+        return itemgetter(self.prefix + name) if rows else attrgetter(name)
+
+    def compile(self, rows):
+        if rows not in self._compiled:
+            compiled = []
+            for key, source, convert in self.fields:
+                if isinstance(convert, type) and issubclass(convert, FastSerializer):
+                    nested = convert(context=self.context, prefix=f'{self.prefix}{source}__')
+                    get = (lambda item: item) if rows else attrgetter(source)
+                    convert = nested.compile(rows)
+                elif isinstance(convert, str):
+                    get, convert = (lambda item: item), getattr(self, convert)(rows)
+                else:
+                    get = self.getter(source, rows)
+                compiled.append((key, get, convert))
+            self._compiled[rows] = self._build(compiled)
+        return self._compiled[rows]
+
+    @staticmethod
+    def _build(compiled):
+        def to_representation(item):
+            ret = {}
+            for key, get, convert in compiled:
+                value = get(item)
+                ret[key] = value if value is None or convert is None else convert(value)
+            return ret
+        return to_representation
+
+    def to_representation(self, item):
+        return self.compile(isinstance(item, dict))(item)
+
+    @property
+    def data(self):
+        if not self.many:
+            with timed('serialize'):
+                return self.to_representation(self.instance)
+        items = list(self.instance)
+        if not items:
+            return []
+        with timed('serialize'):
+            to_representation = self.compile(isinstance(items[0], dict))
+            return [to_representation(item) for item in items]
+
+
+class FastCourseSerializer(FastSerializer):
+    """Аналог CourseSerializer"""
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('description', 'description', None),
+        ('hours', 'hours', None),
+        ('img', None, 'img_getter'),
+        ('start_date', 'start_date', date_formatter('%d-%m-%Y')),
+        ('end_date', 'end_date', date_formatter('%d-%m-%Y')),
+        ('price', 'price', decimal_formatter(Course._meta.get_field('price'))),
+        ('lesson_count', 'lesson_count', None),
+        ('lesson_hours', 'lesson_hours', None),
+    )
+    method_sources = {'img_getter': ('img', 'img_variants')}
+
+    def img_getter(self, rows):
+        """Адрес обложки как в CourseSerializer.get_img"""
+        storage = Course._meta.get_field('img').storage
+        if rows:
+            get_name, get_variants = self.getter('img', rows), self.getter('img_variants', rows)
+        else:
+            get_name, get_variants = (lambda obj: obj.img.name), attrgetter('img_variants')
+
+        def get_img(item):
+            name = get_name(item)
+            if not name:
+                return None
+            return course_image_url(storage, name, get_variants(item), self.context)
+        return get_img
+
+
+class FastLessonSerializer(FastSerializer):
+    """Аналог LessonSerializer"""
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('description', 'text_content', None),
+        ('video_link', 'video_link', None),
+        ('hours', 'hours', None),
+    )
+
+
+class FastEnrollmentSerializer(FastSerializer):
+    """Аналог EnrollmentSerializer (payment_status - код статуса)"""
+    fields = (
+        ('id', 'id', None),
+        ('payment_status', 'status', None),
+        ('course', 'course', FastCourseSerializer),
+    )
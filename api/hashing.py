@@ -0,0 +1,150 @@
+"""Хеширование паролей в ограниченном пуле потоков.
+
+PBKDF2 и scrypt из hashlib отпускают GIL, поэтому пул потоков дает
+настоящий параллелизм. Размер очереди ограничен: когда пул занят,
+запрос сразу получает 503 вместо ожидания в потоке воркера.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from .exceptions import ServiceUnavailable
+
+DEFAULT_PASSWORD_HASHING = {
+    'WORKERS': 4,
+    'MAX_PENDING': 32,
+}
+
+
+class HashingExecutor:
+    """Пул потоков с ограничением числа выполняемых и ожидающих задач"""
+
+    def __init__(self, workers=None, max_pending=None):
+        config = {**DEFAULT_PASSWORD_HASHING, **getattr(settings, 'PASSWORD_HASHING', {})}
+        self.workers = workers or config['WORKERS']
+        self.max_pending = max_pending or config['MAX_PENDING']
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'rejected': 0}
+
+    def submit(self, fn, *args, **kwargs):
+        """Ставит задачу в пул или сразу отказывает (503), если пул переполнен"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise ServiceUnavailable()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._stats['submitted'] += 1
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Выполняет задачу в пуле и ждет результата (для синхронных view)"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def arun(self, fn, *args, **kwargs):
+        """Выполняет задачу в пуле, не блокируя цикл событий (для async view)"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, max_pending=self.max_pending)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hashing_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = HashingExecutor()
+        return _executor
+
+
+@receiver(setting_changed)
+def reset_hashing_executor(setting, **kwargs):
+    global _executor
+    if setting == 'PASSWORD_HASHING' and _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def _check(raw_password, encoded):
+    """Проверка пароля; второй элемент - нужно ли перехешировать пароль"""
+    outdated = []
+    valid = check_password(raw_password, encoded, setter=lambda _: outdated.append(True))
+    return valid, bool(outdated)
+
+
+def hash_password(raw_password):
+    """Хеш пароля, вычисленный в пуле"""
+    return get_hashing_executor().run(make_password, raw_password)
+
+
+async def ahash_password(raw_password):
+    return await get_hashing_executor().arun(make_password, raw_password)
+
+
+class PooledHashingBackend(ModelBackend):
+    """ModelBackend с проверкой пароля в пуле.
+
+    Подключается через AUTHENTICATION_BACKENDS, поэтому вход идет обычным
+    authenticate()/aauthenticate() со всеми его сигналами.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        executor = get_hashing_executor()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хешируем впустую, чтобы время ответа не выдавало наличие email.
+            executor.run(make_password, password)
+            return None
+        valid, outdated = executor.run(_check, password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if outdated:
+            user.password = executor.run(make_password, password)
+            user.save(update_fields=['password'])
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        executor = get_hashing_executor()
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await executor.arun(make_password, password)
+            return None
+        valid, outdated = await executor.arun(_check, password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if outdated:
+            user.password = await executor.arun(make_password, password)
+            await user.asave(update_fields=['password'])
+        return user
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.dataio import DATASETS, FORMATS, DataImportError, detect_format, export_rows
+
+
+class Command(BaseCommand):
+    """Потоковая выгрузка курсов, уроков и записей в CSV/JSONL"""
+    help = 'Выгружает данные, читая БД порциями через iterator()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('path', nargs='?', default='-', help='Путь к файлу или "-" для stdout')
+        parser.add_argument('--format', choices=FORMATS, default=None, help='По умолчанию по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Строк в одной порции чтения')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = detect_format(path, options['format'] or ('jsonl' if path == '-' else None))
+        except DataImportError as exc:
+            raise CommandError(str(exc))
+        if path == '-':
+            count = export_rows(options['dataset'], self.stdout, fmt, options['chunk_size'])
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                count = export_rows(options['dataset'], stream, fmt, options['chunk_size'])
+            self.stdout.write(f'Выгружено строк: {count}')
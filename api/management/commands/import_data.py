@@ -0,0 +1,32 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from api.dataio import DATASETS, FORMATS, DataImportError, detect_format, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    """Потоковый импорт курсов, уроков и записей из CSV/JSONL"""
+    help = 'Загружает данные пачками через bulk_create; существующие строки обновляются'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('path', help='Путь к файлу или "-" для stdin')
+        parser.add_argument('--format', choices=FORMATS, default=None, help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=500, help='Строк в одной транзакции')
+        parser.add_argument('--no-images', action='store_true', help='Не строить варианты обложек')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = detect_format(path, options['format'] or ('jsonl' if path == '-' else None))
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+            try:
+                count = import_rows(
+                    options['dataset'], read_rows(stream, fmt),
+                    batch_size=options['batch_size'], images=not options['no_images'],
+                )
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+        except (DataImportError, ValueError, OSError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f'Импортировано строк: {count}')
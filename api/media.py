@@ -0,0 +1,71 @@
+"""Обложки курсов: адреса и раздача файлов.
+
+Имена файлов содержат хеш содержимого (courses.models.course_image_path,
+courses.images), поэтому файл по одному адресу никогда не меняется и
+отдается с Cache-Control: immutable. Файлы со старыми случайными именами
+отдаются с обязательной перепроверкой (ETag/Last-Modified, ответ 304).
+"""
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{20}\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+
+@lru_cache(maxsize=8192)
+def absolute_media_url(storage, base_url, name):
+    """Абсолютный адрес файла; кешируется по хосту и имени"""
+    url = storage.url(name)
+    if url.startswith('/') and not url.startswith('//'):
+        return base_url + url
+    return url
+
+
+@receiver(setting_changed)
+def clear_media_urls(setting, **kwargs):
+    if setting in ('MEDIA_URL', 'STORAGES'):
+        absolute_media_url.cache_clear()
+
+
+class MediaView(View):
+    """Раздача файлов из MEDIA_ROOT с заголовками для CDN и браузеров"""
+    query_budget = 0
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            raise Http404
+        if not os.path.isfile(full_path):
+            raise Http404
+
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(path) else REVALIDATE_CACHE_CONTROL
+        headers = {'ETag': etag, 'Last-Modified': http_date(stat.st_mtime), 'Cache-Control': cache_control}
+
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            content_type, encoding = mimetypes.guess_type(full_path)
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type or 'application/octet-stream')
+            response['Content-Length'] = stat.st_size
+            if encoding:
+                response['Content-Encoding'] = encoding
+        for name, value in headers.items():
+            response[name] = value
+        return response
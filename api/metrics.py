@@ -0,0 +1,187 @@
+"""Метрики производительности запросов.
+
+Для каждого запроса, попавшего в выборку (PERFORMANCE_METRICS['SAMPLE_RATE']),
+собираются число запросов к БД и время БД, сериализации, рендеринга и
+всего запроса. Значения уходят в заголовок Server-Timing и в гистограммы
+по эндпоинтам, которые отдает /metrics в текстовом формате Prometheus.
+Гистограммы хранятся в памяти процесса.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+
+DEFAULT_PERFORMANCE_METRICS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,
+    'SERVER_TIMING': True,
+    # Доступ к /metrics: по заголовку "Authorization: Bearer <токен>" или с
+    # адресов из ALLOWED_IPS. Пока не задано ни то, ни другое, /metrics - 404.
+    'TOKEN': None,
+    'ALLOWED_IPS': (),
+}
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Метрика: (описание, границы корзин)
+HISTOGRAMS = {
+    'request_duration_seconds': ('Время обработки запроса', DURATION_BUCKETS),
+    'db_duration_seconds': ('Время запросов к БД', DURATION_BUCKETS),
+    'serialize_duration_seconds': ('Время сериализации', DURATION_BUCKETS),
+    'render_duration_seconds': ('Время рендеринга ответа', DURATION_BUCKETS),
+    'db_queries': ('Число запросов к БД', QUERY_BUCKETS),
+}
+METRIC_PREFIX = 'school_api_'
+
+
+def get_config():
+    return {**DEFAULT_PERFORMANCE_METRICS, **getattr(settings, 'PERFORMANCE_METRICS', {})}
+
+
+class RequestMetrics:
+    """Измерения одного запроса"""
+    __slots__ = ('started', 'queries', 'db', 'serialize', 'render')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = self.serialize = self.render = 0.0
+
+    def server_timing(self, total):
+        parts = [
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize * 1000:.2f}',
+            f'render;dur={self.render * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]
+        return ', '.join(parts)
+
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+@contextmanager
+def timed(name):
+    """Добавляет время блока к полю name измерений текущего запроса"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, name, getattr(metrics, name) + time.perf_counter() - started)
+
+
+def query_timer(execute, sql, params, many, context):
+    """execute_wrapper: считает запросы и время БД текущего запроса"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db += time.perf_counter() - started
+        metrics.queries += 1
+
+
+class Histogram:
+    """Гистограмма Prometheus: накопительные корзины, сумма и количество"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Гистограммы по эндпоинтам (имя view и метод)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._responses = {}
+
+    def observe(self, view, method, status, metrics, total):
+        values = {
+            'request_duration_seconds': total,
+            'db_duration_seconds': metrics.db,
+            'serialize_duration_seconds': metrics.serialize,
+            'render_duration_seconds': metrics.render,
+            'db_queries': metrics.queries,
+        }
+        with self._lock:
+            for name, value in values.items():
+                key = (name, view, method)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(HISTOGRAMS[name][1])
+                self._histograms[key].observe(value)
+            key = (view, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._responses.clear()
+
+    def render(self):
+        """Текстовый формат Prometheus (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, (description, _) in HISTOGRAMS.items():
+                lines += [f'# HELP {METRIC_PREFIX}{name} {description}', f'# TYPE {METRIC_PREFIX}{name} histogram']
+                for (metric, view, method), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = f'view="{view}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{METRIC_PREFIX}{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{METRIC_PREFIX}{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{METRIC_PREFIX}{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{METRIC_PREFIX}{name}_count{{{labels}}} {histogram.count}')
+            lines += [f'# HELP {METRIC_PREFIX}responses_total Ответы по статусам',
+                      f'# TYPE {METRIC_PREFIX}responses_total counter']
+            for (view, method, status), count in sorted(self._responses.items()):
+                lines.append(
+                    f'{METRIC_PREFIX}responses_total{{view="{view}",method="{method}",status="{status}"}} {count}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+metrics_registry = MetricsRegistry()
+
+
+class MetricsView(View):
+    """Метрики процесса в формате Prometheus"""
+    query_budget = 0
+
+    def get(self, request):
+        config = get_config()
+        token, allowed_ips = config['TOKEN'], config['ALLOWED_IPS']
+        if not token and not allowed_ips:
+            raise Http404
+        authorized = (
+            token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+        ) or request.META.get('REMOTE_ADDR') in allowed_ips
+        if not authorized:
+            return HttpResponse(status=403)
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,129 @@
+"""Middleware сбора метрик производительности (см. api.metrics)"""
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from .metrics import RequestMetrics, current_metrics, get_config, metrics_registry, query_timer
+from .routing import RoutingState, current_routing, sticky_users, wants_replica
+
+
+def install_query_timer(connection):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+@receiver(connection_created)
+def connection_created_handler(sender, connection, **kwargs):
+    """Подключения создаются в каждом потоке, таймер ставится на каждое"""
+    install_query_timer(connection)
+
+
+class PerformanceMiddleware:
+    """Замеры запроса, заголовок Server-Timing и гистограммы по эндпоинтам.
+
+    Ставится первым в MIDDLEWARE, чтобы total включал остальные middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self):
+        config = get_config()
+        if not config['ENABLED'] or random.random() >= config['SAMPLE_RATE']:
+            return None, None
+        metrics = RequestMetrics()
+        return metrics, current_metrics.set(metrics)
+
+    def process_template_response(self, request, response):
+        """Ответы DRF рендерятся после view: замеряем рендеринг отдельно"""
+        metrics = current_metrics.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def stop(rendered):
+                metrics.render += time.perf_counter() - started
+            response.add_post_render_callback(stop)
+        return response
+
+    def finish(self, request, response, metrics):
+        if metrics is None:
+            return response
+        total = time.perf_counter() - metrics.started
+        if get_config()['SERVER_TIMING']:
+            response['Server-Timing'] = metrics.server_timing(total)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            metrics_registry.observe(match.view_name, request.method, response.status_code, metrics, total)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Состояние маршрутизации запроса для api.routing.ReplicaRouter"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(request)
+        token = current_routing.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            current_routing.reset(token)
+            self.finish(state)
+
+    async def __acall__(self, request):
+        state = RoutingState(request)
+        token = current_routing.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+            self.finish(state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_routing.get()
+        if state is not None:
+            state.replica = wants_replica(view_func, request.method)
+
+    def finish(self, state):
+        if state.wrote:
+            user_id = state.user_id()
+            if user_id is not None:
+                sticky_users.mark(user_id)
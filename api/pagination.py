@@ -1,5 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import math
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class CustomPagination(PageNumberPagination):
     """пагинация"""
@@ -14,4 +22,161 @@ class CustomPagination(PageNumberPagination):
                 'current': self.page.number,
                 'per_page': self.page_size
             }
-        })
\ No newline at end of file
+        })
+
+
+TOTAL_QUERY_PARAM = 'with_total'
+
+
+def wants_total(request):
+    """Запрошено ли общее число страниц (``?with_total=1``)"""
+    return request.query_params.get(TOTAL_QUERY_PARAM) in ('1', 'true')
+
+
+def page_count(count, page_size):
+    """Число страниц как у Paginator.num_pages (пустой список - одна страница)"""
+    return max(1, math.ceil(count / page_size))
+
+
+class CustomCursorPagination(CursorPagination):
+    """курсорная (keyset) пагинация: глубокие страницы стоят как первая
+
+    Ключи ответа те же, что у CustomPagination, плюс ссылки ``next`` и
+    ``previous`` с курсорами. ``total`` (число страниц) и ``current`` (номер
+    страницы) требуют COUNT по таблице, поэтому считаются только по запросу
+    ``?with_total=1``, иначе они None.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        self.count = self.before = None
+        if page is not None and wants_total(request):
+            counts = queryset.order_by().aggregate(**self.get_counts(page))
+            self.count, self.before = counts['count'], counts.get('before', 0)
+        return page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset.
+
+        CursorPagination в DRF синхронная, поэтому страница выбирается ее же
+        кодом в потоке ORM, а не копией ее внутренностей.
+        """
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_counts(self, page):
+        """Агрегаты: всего строк и строк перед первой строкой страницы"""
+        counts = {'count': Count('pk')}
+        if page:
+            order = self.ordering[0]
+            field = order.lstrip('-')
+            first = page[0][field] if isinstance(page[0], dict) else getattr(page[0], field)
+            lookup = f'{field}__gt' if order.startswith('-') else f'{field}__lt'
+            counts['before'] = Count('pk', filter=Q(**{lookup: first}))
+        return counts
+
+    def get_paginated_response(self, data):
+        return Response({
+            'data': data,
+            'pagination': {
+                'total': None if self.count is None else page_count(self.count, self.page_size),
+                'current': None if self.before is None else self.before // self.page_size + 1,
+                'per_page': self.page_size,
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+            }
+        })
+
+
+class SearchPagination(PageNumberPagination):
+    """постраничный вывод ранжированных результатов
+
+    Выбирается на одну строку больше страницы, чтобы узнать о следующей.
+    Конверт тот же, что у CustomCursorPagination: ``total`` считается только
+    по ``?with_total=1``.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_search(self, search, request, count=None):
+        """search(limit, offset) возвращает строки по релевантности.
+
+        count() - число всех совпадений, вызывается только по ``?with_total=1``.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.number = 0
+        if self.number < 1:
+            raise NotFound(self.invalid_page_message)
+        rows = list(search(self.page_size + 1, (self.number - 1) * self.page_size))
+        self.has_next = len(rows) > self.page_size
+        self.count = count() if count is not None and wants_total(request) else None
+        return rows[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.number + 1)
+
+    def get_previous_link(self):
+        if self.number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'data': data,
+            'pagination': {
+                'total': None if self.count is None else page_count(self.count, self.page_size),
+                'current': self.number,
+                'per_page': self.page_size,
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+            }
+        })
+
+
+class EstimatedCountPaginator(Paginator):
+    """пагинатор админки для больших таблиц: без полного COUNT(*)
+
+    Без фильтров на PostgreSQL число строк берется из статистики
+    (pg_class.reltuples). Иначе строки считаются от начала запрошенной
+    страницы ``page_number`` не дальше ``max_count``: COUNT по подзапросу
+    с OFFSET/LIMIT читает не больше max_count строк индекса. Итог - оценка
+    снизу, но каждая следующая страница сдвигает границу, так что
+    до последней записи можно дойти постранично.
+    """
+    max_count = 10000
+
+    def __init__(self, *args, page_number=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.page_number = page_number
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = self._estimate(queryset)
+        if estimate is not None and estimate > self.max_count:
+            return estimate
+        start = max(self.page_number - 1, 0) * self.per_page
+        return start + queryset[start:start + self.max_count].count()
+
+    @staticmethod
+    def _estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else None
@@ -0,0 +1,122 @@
+"""Маршрутизация чтения на реплику БД.
+
+Чтение каталога и записей (приложения из REPLICA_ROUTING['APPS']) уходит
+на реплику только во view, помеченных атрибутом ``read_replica``. После
+записи запрос до конца читает с основной БД, а пользователь, который
+что-то записал, читает с основной еще STICKY_SECONDS (read-your-writes).
+Пометки хранятся в бэкенде кеша каталога (CATALOG_CACHE): с файловым
+бэкендом или Redis их видят все процессы.
+
+Если реплика указывает на ту же БД, что и default (разработка, тесты),
+маршрутизация не выполняется.
+"""
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject
+from .cache import catalog_cache
+
+DEFAULT_REPLICA_ROUTING = {
+    'ALIAS': 'replica',
+    'APPS': ('courses', 'students'),
+    'STICKY_SECONDS': 10,
+}
+
+
+def get_config():
+    return {**DEFAULT_REPLICA_ROUTING, **getattr(settings, 'REPLICA_ROUTING', {})}
+
+
+class RoutingState:
+    """Состояние маршрутизации одного запроса"""
+    __slots__ = ('request', 'replica', 'wrote', 'sticky')
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = False
+        self.wrote = False
+        # Отметка пользователя читается из кеша один раз за запрос.
+        self.sticky = None
+
+    def user_id(self):
+        """id аутентифицированного пользователя API, если он уже известен"""
+        user = getattr(self.request, 'api_user', None) or self.request.__dict__.get('user')
+        if isinstance(user, SimpleLazyObject):
+            return None
+        return getattr(user, 'pk', None)
+
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+class StickyUsers:
+    """Пользователи, недавно писавшие в БД"""
+
+    def mark(self, user_id):
+        seconds = get_config()['STICKY_SECONDS']
+        if seconds > 0:
+            catalog_cache.mark_sticky(user_id, seconds)
+
+    def is_sticky(self, user_id):
+        return catalog_cache.is_sticky(user_id)
+
+
+sticky_users = StickyUsers()
+
+
+def replica_alias():
+    """Псевдоним реплики или None, если отдельной реплики нет"""
+    alias = get_config()['ALIAS']
+    if alias not in connections.settings:
+        return None
+    replica, primary = connections[alias].settings_dict, connections[DEFAULT_DB_ALIAS].settings_dict
+    if (replica['ENGINE'], replica['NAME'], replica.get('HOST')) == \
+            (primary['ENGINE'], primary['NAME'], primary.get('HOST')):
+        return None
+    return alias
+
+
+def wants_replica(view_func, method):
+    """Помечен ли view (или действие ViewSet) как читающий с реплики"""
+    if method not in ('GET', 'HEAD'):
+        return False
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    setting = getattr(view_class, 'read_replica', False)
+    if isinstance(setting, (set, frozenset, tuple, list)):
+        actions = getattr(view_func, 'actions', None) or {}
+        return actions.get(method.lower()) in setting
+    return bool(setting)
+
+
+class ReplicaRouter:
+    """Роутер БД: запись всегда в default, чтение - см. описание модуля"""
+
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if state is None or not state.replica or state.wrote:
+            return None
+        if model._meta.app_label not in get_config()['APPS']:
+            return None
+        alias = replica_alias()
+        if alias is None:
+            return None
+        if state.sticky is None:
+            user_id = state.user_id()
+            if user_id is None:
+                return alias
+            state.sticky = sticky_users.is_sticky(user_id)
+        return DEFAULT_DB_ALIAS if state.sticky else alias
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == get_config()['ALIAS']:
+            return False
+        return None
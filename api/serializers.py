@@ -1,11 +1,42 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from courses.images import get_config as get_image_config
 from courses.models import Course, Lesson
 from students.models import Enrollment
+from .hashing import hash_password
+from .media import absolute_media_url
 import re
 
 User = get_user_model()
 
+def image_variant_key(context):
+    """Ключ варианта обложки из параметров запроса, один раз на весь список."""
+    if '_variant_key' not in context:
+        request = context.get('request')
+        params = getattr(request, 'query_params', None) or getattr(request, 'GET', {})
+        key = params.get('img_size') or get_image_config()['DEFAULT_SIZE']
+        if params.get('img_format') == 'webp':
+            key += '.webp'
+        context['_variant_key'] = key
+    return context['_variant_key']
+
+def request_base_url(context):
+    """Схема и хост запроса, вычисляются один раз на весь список."""
+    if '_base_url' not in context:
+        request = context.get('request')
+        context['_base_url'] = request.build_absolute_uri('/')[:-1] if request else ''
+    return context['_base_url']
+
+def course_image_url(storage, name, variants, context):
+    """Абсолютный адрес обложки курса.
+
+    Размер варианта выбирается параметрами запроса ``img_size``
+    (small, medium, large, original) и ``img_format=webp``; пока
+    варианты не построены, отдается исходный файл.
+    """
+    name = variants.get(image_variant_key(context), name)
+    return absolute_media_url(storage, request_base_url(context), name)
+
 class RegistrationSerializer(serializers.ModelSerializer):
     """Сериализатор для регистрации пользователя"""
     password = serializers.CharField(write_only=True)
@@ -29,12 +60,11 @@ class RegistrationSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        """Создание пользователя с хешированием пароля."""
-        user = User.objects.create_user(
-            username=validated_data['email'], 
-            email=validated_data['email'],
-            password=validated_data['password']
-        )
+        """Создание пользователя с хешированием пароля в пуле (api.hashing)."""
+        email = User.objects.normalize_email(validated_data['email'])
+        user = User(username=User.normalize_username(email), email=email)
+        user.password = hash_password(validated_data['password'])
+        user.save()
         return user
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -46,14 +76,16 @@ class CourseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Course
-        fields = ('id', 'name', 'description', 'hours', 'img', 'start_date', 'end_date', 'price')
+        fields = (
+            'id', 'name', 'description', 'hours', 'img', 'start_date', 'end_date', 'price',
+            'lesson_count', 'lesson_hours',
+        )
 
     def get_img(self, obj):
-        """Возвращает абсолютный путь к изображению."""
-        request = self.context.get('request')
-        if obj.img:
-            return request.build_absolute_uri(obj.img.url)
-        return None
+        """Возвращает абсолютный путь к изображению (см. course_image_url)"""
+        if not obj.img:
+            return None
+        return course_image_url(obj.img.storage, obj.img.name, obj.img_variants, self.context)
 
 class LessonSerializer(serializers.ModelSerializer):
     """Сериализатор для урока"""
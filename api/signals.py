@@ -0,0 +1,61 @@
+"""Сигналы API"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from courses.models import Course, Lesson
+from students.models import Enrollment
+from students.signals import enrollments_changed
+from .authentication import token_cache
+from .cache import catalog_cache
+from .routing import sticky_users
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    """Сброс кеша каталога при изменении курса"""
+    pk = instance.pk
+    transaction.on_commit(lambda: catalog_cache.invalidate_course(pk))
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def invalidate_lesson_cache(sender, instance, **kwargs):
+    """Сброс кеша уроков курса при изменении урока"""
+    course_id = instance.course_id
+    transaction.on_commit(lambda: catalog_cache.invalidate_lessons(course_id))
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_token_cache(sender, instance, **kwargs):
+    """Сброс закешированного токена"""
+    token_cache.invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Сброс токенов пользователя при его изменении или деактивации"""
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_enrollment_status(sender, instance, **kwargs):
+    """Сброс статусов записей студента (api.statuses)"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: catalog_cache.invalidate_statuses(user_id))
+
+
+@receiver(enrollments_changed)
+def invalidate_enrollment_statuses(sender, user_ids, **kwargs):
+    """Сброс статусов после изменения записей в обход save()/delete().
+
+    Записи меняет не сам студент (вебхук оплаты, очередь событий), поэтому
+    он отмечается читающим с основной БД (api.routing), пока реплика отстает.
+    """
+    user_ids = set(user_ids)
+
+    def changed():
+        catalog_cache.invalidate_statuses(*user_ids)
+        for user_id in user_ids:
+            sticky_users.mark(user_id)
+    transaction.on_commit(changed)
@@ -0,0 +1,41 @@
+"""Потоковая отдача больших списков.
+
+Элементы читаются из БД порциями через iterator() и сериализуются по
+мере отправки, поэтому память воркера не зависит от размера списка.
+Ответ побайтно совпадает с обычным Response({"data": [...]}).
+"""
+from itertools import islice
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+STREAM_QUERY_PARAM = 'stream'
+DEFAULT_CHUNK_SIZE = 500
+
+
+def wants_stream(request):
+    """Запрошена ли потоковая отдача (``?stream=1``)"""
+    return request.query_params.get(STREAM_QUERY_PARAM) in ('1', 'true')
+
+
+def stream_json_list(queryset, serializer_class, context=None, key='data', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Части JSON-ответа {key: [...]}; каждая порция сериализуется отдельно"""
+    renderer = JSONRenderer()
+    # Общий контекст: сериализаторы кешируют в нем значения на весь список.
+    context = {} if context is None else context
+    rows = queryset.iterator(chunk_size=chunk_size)
+    yield b'{' + renderer.render(key) + b':['
+    separator = b''
+    while chunk := list(islice(rows, chunk_size)):
+        data = serializer_class(chunk, many=True, context=context).data
+        yield separator + b','.join(renderer.render(item) for item in data)
+        separator = b','
+    yield b']}'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """Потоковый ответ со списком в конверте {"data": [...]}"""
+
+    def __init__(self, queryset, serializer_class, context=None, key='data',
+                 chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(stream_json_list(queryset, serializer_class, context, key, chunk_size), **kwargs)
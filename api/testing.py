@@ -0,0 +1,48 @@
+"""Вспомогательные средства для тестов API"""
+from urllib.parse import urlsplit
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APITestCase
+from students.certificates import certificate_registry
+from .authentication import token_cache
+from .cache import catalog_cache
+
+
+def get_query_budget(path, method):
+    """Объявленный во view бюджет запросов к БД для пути и HTTP-метода.
+
+    Бюджет задается атрибутом ``query_budget`` класса view: числом или
+    словарем {действие ViewSet или http-метод: число}.
+    """
+    match = resolve(urlsplit(path).path)
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        actions = getattr(match.func, 'actions', None) or {}
+        budget = budget.get(actions.get(method.lower(), method.lower()))
+    return budget
+
+
+class QueryBudgetTestCase(APITestCase):
+    """Базовый тест API с проверкой бюджета запросов"""
+
+    def setUp(self):
+        super().setUp()
+        catalog_cache.clear()
+        token_cache.clear()
+        certificate_registry.reset()
+
+    def assertWithinQueryBudget(self, method, path, *args, **kwargs):
+        """Выполняет запрос и падает, если эндпоинт превысил свой бюджет"""
+        budget = get_query_budget(path, method)
+        if budget is None:
+            self.fail(f'{method.upper()} {path}: бюджет запросов не объявлен')
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method.lower())(path, *args, **kwargs)
+        if len(ctx) > budget:
+            queries = '\n'.join(q['sql'] for q in ctx.captured_queries)
+            self.fail(
+                f'{method.upper()} {path}: {len(ctx)} запросов при бюджете {budget}\n{queries}'
+            )
+        return response
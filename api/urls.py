@@ -1,6 +1,9 @@
 """Маршрутизация API"""
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import (
+    AsyncAuthView, AsyncCourseListView, AsyncCourseDetailView, AsyncOrdersView, AsyncPaymentWebhookView
+)
 from .views import (
     RegistrationView, AuthView, CourseViewSet, PaymentWebhookView,
     MyOrdersView, CancelOrderView, CheckCertificateView
@@ -17,5 +20,11 @@ urlpatterns = [
     path('orders/<int:pk>', CancelOrderView.as_view(), name='orders-cancel'),
       
     path('check-sertificate', CheckCertificateView.as_view(), name='check-certificate'),
+
+    path('async/auth', AsyncAuthView.as_view(), name='async-auth'),
+    path('async/courses', AsyncCourseListView.as_view(), name='async-courses-list'),
+    path('async/courses/<int:pk>', AsyncCourseDetailView.as_view(), name='async-courses-detail'),
+    path('async/orders', AsyncOrdersView.as_view(), name='async-orders-list'),
+    path('async/payment-webhook', AsyncPaymentWebhookView.as_view(), name='async-payment-webhook'),
     path('', include(router.urls)),
 ]
@@ -5,16 +5,26 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from django.utils import timezone
 from .serializers import (
-    RegistrationSerializer, CourseSerializer, LessonSerializer, EnrollmentSerializer
+    RegistrationSerializer, CourseSerializer, EnrollmentSerializer
 )
+from .cache import catalog_cache
+from .fast_serializers import FastCourseSerializer, FastEnrollmentSerializer, FastLessonSerializer
+from .conditional import catalog_version, course_version, is_not_modified, make_etag
+from .pagination import CustomCursorPagination, SearchPagination
+from .statuses import add_statuses, enrollment_statuses, statuses_version, wants_statuses
+from .streaming import StreamingJSONResponse, wants_stream
 from courses.models import Course
+from courses.search import count_courses, search_courses
+from students.certificates import certificate_registry
+from students.enrollments import enroll
 from students.models import Enrollment
-import uuid
+from students.payments import handle_payment_webhook
 import datetime
 
 class RegistrationView(views.APIView):
     """регистрации пользователей"""
     permission_classes = [permissions.AllowAny]
+    query_budget = 3
 
     def post(self, request):
         serializer = RegistrationSerializer(data=request.data)
@@ -26,6 +36,7 @@ class RegistrationView(views.APIView):
 class AuthView(views.APIView):
     """авторизации"""
     permission_classes = [permissions.AllowAny]
+    query_budget = 5
 
     def post(self, request):
         email = request.data.get('email')
@@ -38,7 +49,7 @@ class AuthView(views.APIView):
                 "errors": {"email": ["Invalid data"]} 
             }, status=422)
 
-        user = authenticate(username=email, password=password)
+        user = authenticate(request, username=email, password=password)
         if user:
             token, _ = Token.objects.get_or_create(user=user)
             return Response({"token": token.key})
@@ -53,37 +64,107 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomCursorPagination
+    query_budget = {'list': 5, 'retrieve': 4, 'buy': 3, 'search': 4}
+    read_replica = {'list', 'retrieve', 'search'}
+
+    def get_queryset(self):
+        if self.action == 'list':
+            return FastCourseSerializer.values(super().get_queryset())
+        if self.action == 'buy':
+            return super().get_queryset().with_availability(timezone.now().date())
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return FastCourseSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """Список курсов с кешированием страниц и ответом 304 по ETag
+
+        ``?with_status=1`` добавляет статус записи текущего студента (api.statuses).
+        """
+        version = catalog_version()
+        statuses = enrollment_statuses(request.user) if wants_statuses(request) else None
+        page_etag = make_etag(request, version)
+        etag = page_etag if statuses is None else make_etag(request, version, statuses_version(statuses))
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        cached = catalog_cache.get_page(request)
+        cache_status = 'hit'
+        if cached is None or cached['etag'] != page_etag:
+            cache_status = 'miss'
+            cached = {'etag': page_etag, 'body': super().list(request, *args, **kwargs).data}
+            catalog_cache.set_page(request, cached)
+        body = cached['body'] if statuses is None else add_statuses(cached['body'], statuses)
+        return Response(body, headers={'X-Catalog-Cache': cache_status, 'ETag': etag})
 
     def retrieve(self, request, *args, **kwargs):
         """Получение детальной информации о курсе"""
-        
-        instance = self.get_object()
-        lessons = instance.lessons.all()
-        serializer = LessonSerializer(lessons, many=True)
-        return Response({"data": serializer.data})
+        pk = kwargs.get(self.lookup_field)
+        version = str(course_version(pk))
+        etag = make_etag(request, pk, version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        # Запись кеша общая с async-версией: сверяется только версия курса,
+        # ETag зависит от адреса и у каждой версии свой.
+        cached = catalog_cache.get_course(pk)
+        cache_status = 'hit'
+        if cached is None or cached['version'] != version:
+            cache_status = 'miss'
+            instance = self.get_object()
+            lessons = FastLessonSerializer.values(instance.lessons.order_by('pk'))
+            serializer = FastLessonSerializer(lessons, many=True)
+            cached = {'version': version, 'body': {"data": serializer.data}}
+            catalog_cache.set_course(instance.pk, cached)
+        return Response(cached['body'], headers={'X-Catalog-Cache': cache_status, 'ETag': etag})
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """Полнотекстовый поиск по курсам и урокам, лучшие совпадения первыми"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                "message": "Invalid data",
+                "errors": {"q": ["This field is required."]}
+            }, status=422)
+
+        version = catalog_version()
+        statuses = enrollment_statuses(request.user) if wants_statuses(request) else None
+        page_etag = make_etag(request, version)
+        etag = page_etag if statuses is None else make_etag(request, version, statuses_version(statuses))
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        cached = catalog_cache.get_page(request)
+        cache_status = 'hit'
+        if cached is None or cached['etag'] != page_etag:
+            cache_status = 'miss'
+            paginator = SearchPagination()
+            page = paginator.paginate_search(
+                lambda limit, offset: search_courses(query, limit, offset), request,
+                count=lambda: count_courses(query),
+            )
+            data = FastCourseSerializer(page, many=True, context=self.get_serializer_context()).data
+            cached = {'etag': page_etag, 'body': paginator.get_paginated_response(data).data}
+            catalog_cache.set_page(request, cached)
+        body = cached['body'] if statuses is None else add_statuses(cached['body'], statuses)
+        return Response(body, headers={'X-Catalog-Cache': cache_status, 'ETag': etag})
 
     @action(detail=True, methods=['post'], url_path='buy')
     def buy(self, request, pk=None):
         """Действие для покупки (записи на) курс"""
         course = self.get_object()
-        today = timezone.now().date()
-        
-        if today >= course.start_date or today > course.end_date:
+
+        if not course.is_available:
             return Response({"message": "Course unavailable"}, status=400) 
 
-        order_id = uuid.uuid4().hex
-        enrollment, created = Enrollment.objects.get_or_create(
-            user=request.user,
-            course=course,
-            defaults={'order_id': order_id, 'status': 'pending'}
-        )
-        
-        if not created and enrollment.status == 'success':
+        order_id = enroll(request.user, course)
+        if order_id is None:
              return Response({"message": "Already enrolled"}, status=400)
-        
-        if not created:
-            enrollment.order_id = order_id
-            enrollment.save()
 
         pay_url = f"https://payment.provider/pay?order_id={order_id}"
         return Response({"pay_url": pay_url})
@@ -91,36 +172,33 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
 class PaymentWebhookView(views.APIView):
     """Вебхук для обработки статусов оплаты"""
     permission_classes = [permissions.AllowAny]
+    query_budget = 1
 
     def post(self, request):
         order_id = request.data.get('order_id')
         status_val = request.data.get('status') 
 
-        try:
-            enrollment = Enrollment.objects.get(order_id=order_id)
-            if status_val == 'success':
-                enrollment.status = 'success'
-            elif status_val == 'failed':
-                enrollment.status = 'failed'
-            enrollment.save()
-        except Enrollment.DoesNotExist:
-            pass 
-        
+        handle_payment_webhook(order_id, status_val)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class EnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet для работы с записями текущего пользователя"""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = EnrollmentSerializer
+    query_budget = {'list': 2, 'retrieve': 3}
+    read_replica = {'list'}
     
     def get_queryset(self):
-        return Enrollment.objects.filter(user=self.request.user)
+        return Enrollment.objects.for_listing().filter(user=self.request.user)
 
     
     def list(self, request, *args, **kwargs):
-        """Получение списка записей"""
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
+        """Получение списка записей (``?stream=1`` - потоковая отдача)"""
+        queryset = FastEnrollmentSerializer.values(self.filter_queryset(self.get_queryset()))
+        context = self.get_serializer_context()
+        if wants_stream(request):
+            return StreamingJSONResponse(queryset, FastEnrollmentSerializer, context)
+        serializer = FastEnrollmentSerializer(queryset, many=True, context=context)
         return Response({"data": serializer.data}) 
 
     def retrieve(self, request, *args, **kwargs):
@@ -139,15 +217,20 @@ class EnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
 class MyOrdersView(views.APIView):
     """получения списка заказов"""
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 2
+    read_replica = True
     
     def get(self, request):
-        enrollments = Enrollment.objects.filter(user=request.user)
-        serializer = EnrollmentSerializer(enrollments, many=True, context={'request': request})
+        enrollments = FastEnrollmentSerializer.values(Enrollment.objects.for_listing().filter(user=request.user))
+        if wants_stream(request):
+            return StreamingJSONResponse(enrollments, FastEnrollmentSerializer, {'request': request})
+        serializer = FastEnrollmentSerializer(enrollments, many=True, context={'request': request})
         return Response({"data": serializer.data})
 
 class CancelOrderView(views.APIView):
     """отмены заказа"""
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get(self, request, pk):
         try:
@@ -163,6 +246,7 @@ class CancelOrderView(views.APIView):
 class CheckCertificateView(views.APIView):
     """проверки сертификата"""
     permission_classes = [permissions.AllowAny] 
+    query_budget = 3
 
     def post(self, request):
            
@@ -171,7 +255,7 @@ class CheckCertificateView(views.APIView):
              return Response({"status": "failed"}, status=200)
 
         
-        if cert_num.endswith('1'):
+        if certificate_registry.verify(str(cert_num)):
             return Response({"status": "success"})
         else:
             return Response({"status": "failed"})
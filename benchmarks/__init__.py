@@ -0,0 +1 @@
+"""Бенчмарки school-api (запуск: python -m benchmarks.<имя>)"""
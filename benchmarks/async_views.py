@@ -0,0 +1,78 @@
+"""Сравнение async-view и синхронного стека DRF под ASGI.
+
+Оба варианта обслуживаются одним ASGI-приложением в одном процессе,
+запросы идут конкурентно через AsyncClient:
+
+    python -m benchmarks.async_views --requests 500 --concurrency 1 10 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.utils import benchmark_database, create_catalog, create_student, setup_django, summarize
+
+ENDPOINTS = {
+    'courses': ('/school-api/courses/', '/school-api/async/courses'),
+    'course': ('/school-api/courses/{pk}/', '/school-api/async/courses/{pk}'),
+    'orders': ('/school-api/orders', '/school-api/async/orders'),
+}
+
+
+async def drive(client, path, headers, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, (path, response.status_code)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run(args):
+    from django.test import AsyncClient
+    from asgiref.sync import sync_to_async
+    from students.models import Enrollment
+
+    user, token = await sync_to_async(create_student)()
+    courses = await sync_to_async(create_catalog)(args.courses)
+    await Enrollment.objects.abulk_create(Enrollment(user=user, course=course) for course in courses)
+
+    client = AsyncClient()
+    headers = {'Authorization': f'Bearer {token.key}'}
+    results = []
+    for name, paths in ENDPOINTS.items():
+        for stack, path in zip(('sync', 'async'), paths):
+            path = path.format(pk=courses[0].pk)
+            for concurrency in args.concurrency:
+                result = await drive(client, path, headers, args.requests, concurrency)
+                results.append({'endpoint': name, 'stack': stack, 'concurrency': concurrency, **result})
+                print(f"{name:8} {stack:5} c={concurrency:<4} {result['throughput_rps']:>8} rps "
+                      f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""Нагрузочный тест school-api на локально запущенном сервере.
+
+Создает временную БД с синтетическими данными, запускает на ней
+``manage.py runserver`` (БД передается через SCHOOL_API_DB) и конкурентно
+обходит все эндпоинты api/urls.py. По каждому эндпоинту считаются
+p50/p95/p99, пропускная способность, коды ответов и число запросов к БД
+(из заголовка Server-Timing, см. api.middleware):
+
+    python -m benchmarks.load_test --users 1000 --courses 200 --requests 200 \\
+        --concurrency 8 --output results/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import BASE_DIR, create_fixtures, setup_django, summarize
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def endpoints(data, run_id):
+    """Эндпоинты: имя -> (метод, функция номера запроса -> (путь, тело, токен))"""
+    users, courses = data['users'], data['courses']
+
+    def user(i):
+        return users[i % len(users)]
+
+    def course(i):
+        return courses[i % len(courses)]
+
+    def cancellable(i):
+        pk, token = data['cancellable'][i]
+        return f'/school-api/orders/{pk}', None, token
+
+    return {
+        'api-root': ('GET', lambda i: ('/school-api/', None, user(i)[1])),
+        'registr': ('POST', lambda i: (
+            '/school-api/registr', {'email': f'load{run_id}-{i}@mail.ru', 'password': 'Pass1_'}, None)),
+        'auth': ('POST', lambda i: ('/school-api/auth', {'email': user(i)[0], 'password': 'Pass1_'}, None)),
+        'courses-list': ('GET', lambda i: ('/school-api/courses/', None, user(i)[1])),
+        'courses-list-status': ('GET', lambda i: ('/school-api/courses/?with_status=1', None, user(i)[1])),
+        'courses-detail': ('GET', lambda i: (f'/school-api/courses/{course(i)}/', None, user(i)[1])),
+        'courses-search': ('GET', lambda i: (
+            f'/school-api/courses/search/?q={("курс", "урок", "опис")[i % 3]}', None, user(i)[1])),
+        'courses-buy': ('POST', lambda i: (f'/school-api/courses/{course(i)}/buy/', None, user(i)[1])),
+        'orders-list': ('GET', lambda i: ('/school-api/orders', None, user(i)[1])),
+        'orders-cancel': ('GET', cancellable),
+        'payment-webhook': ('POST', lambda i: (
+            '/school-api/payment-webhook', {'order_id': data['orders'][i % len(data['orders'])], 'status': 'failed'},
+            None)),
+        'check-certificate': ('POST', lambda i: (
+            '/school-api/check-sertificate',
+            {'sertikate_number': data['certificates'][i % len(data['certificates'])] if i % 2 else '0' * 16}, None)),
+        'async-auth': ('POST', lambda i: (
+            '/school-api/async/auth', {'email': user(i)[0], 'password': 'Pass1_'}, None)),
+        'async-courses-list': ('GET', lambda i: ('/school-api/async/courses', None, user(i)[1])),
+        'async-courses-detail': ('GET', lambda i: (f'/school-api/async/courses/{course(i)}', None, user(i)[1])),
+        'async-orders-list': ('GET', lambda i: ('/school-api/async/orders', None, user(i)[1])),
+        'async-payment-webhook': ('POST', lambda i: (
+            '/school-api/async/payment-webhook',
+            {'order_id': data['orders'][i % len(data['orders'])], 'status': 'failed'}, None)),
+    }
+
+
+def prepare(args):
+    """Миграции и данные во временной БД; возвращает данные для запросов"""
+    from django.core.management import call_command
+    from django.db import connections
+    from students.models import Enrollment
+
+    call_command('migrate', verbosity=0)
+    data = create_fixtures(args.users, args.courses, args.enrollments)
+    tokens = dict(data['users'])
+    emails = dict(Enrollment.objects.values_list('pk', 'user__email'))
+    data['cancellable'] = [
+        (pk, tokens[emails[pk]])
+        for pk in Enrollment.objects.exclude(status='success').order_by('?').values_list('pk', flat=True)
+    ]
+    data['orders'] = list(
+        Enrollment.objects.filter(status='pending').values_list('order_id', flat=True)
+    ) or ['missing']
+    data['certificates'] = list(
+        Enrollment.objects.exclude(certificate_number=None).values_list('certificate_number', flat=True)
+    ) or ['0']
+    connections.close_all()
+    return data
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, env, log):
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload'],
+        cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Сервер не запустился, см. журнал')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Сервер не ответил за 60 секунд')
+
+
+def drive(base_url, method, build, total, concurrency):
+    """Выполняет total запросов в concurrency потоков"""
+    import requests
+
+    local = threading.local()
+    latencies, queries, statuses, failures = [], [], Counter(), []
+    lock = threading.Lock()
+
+    def one(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        path, body, token = build(i)
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        started = time.perf_counter()
+        try:
+            response = local.session.request(method, base_url + path, json=body, headers=headers, timeout=60)
+        except requests.RequestException as exc:
+            with lock:
+                failures.append(str(exc))
+            return
+        elapsed = time.perf_counter() - started
+        match = QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] += 1
+            if match:
+                queries.append(int(match.group(1)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, elapsed) if latencies else {'requests': 0}
+    result.update({
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'errors': len(failures) + sum(count for code, count in statuses.items() if code >= 500),
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    })
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--enrollments', type=int, default=3, help='Записей на студента')
+    parser.add_argument('--requests', type=int, default=100, help='Запросов на эндпоинт')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', nargs='+', help='Только эти эндпоинты (по умолчанию все)')
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    parser.add_argument('--keep-db', action='store_true', help='Не удалять временную БД и журнал сервера')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='school-load-')
+    env = {**os.environ, 'SCHOOL_API_DB': os.path.join(workdir, 'db.sqlite3')}
+    os.environ['SCHOOL_API_DB'] = env['SCHOOL_API_DB']
+    setup_django()
+    import django
+
+    data = prepare(args)
+    run_id = int(time.time())
+    selected = endpoints(data, run_id)
+    if args.endpoints:
+        selected = {name: selected[name] for name in args.endpoints}
+
+    results = []
+    port = free_port()
+    with open(os.path.join(workdir, 'server.log'), 'w') as log:
+        server = start_server(port, env, log)
+        try:
+            for name, (method, build) in selected.items():
+                total = args.requests
+                if name == 'orders-cancel':
+                    total = min(total, len(data['cancellable']))
+                result = {'endpoint': name, 'method': method,
+                          **drive(f'http://127.0.0.1:{port}', method, build, total, args.concurrency)}
+                results.append(result)
+                print(f"{name:22} {result.get('throughput_rps', 0):>8} rps p50={result.get('p50_ms')}ms "
+                      f"p95={result.get('p95_ms')}ms p99={result.get('p99_ms')}ms "
+                      f"queries={result['queries_mean']} statuses={result['statuses']} errors={result['errors']}")
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'django': django.get_version(),
+            'python': sys.version.split()[0],
+            'scale': {'users': args.users, 'courses': args.courses, 'enrollments_per_user': args.enrollments},
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'results': results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.keep_db:
+        print(f'БД и журнал сервера: {workdir}')
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Пропускная способность проверки паролей при входе.
+
+Клиентские потоки (имитация воркеров сервера) проверяют пароли через
+HashingExecutor разного размера и с разными хешерами; для сравнения
+замеряется проверка прямо в потоке запроса ("inline"):
+
+    python -m benchmarks.login_throughput --logins 200 --clients 16 --workers 1 2 4 8
+"""
+import argparse
+import json
+import threading
+import time
+
+from benchmarks.utils import setup_django, summarize
+
+HASHERS = {
+    'pbkdf2_sha256': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'pbkdf2_sha1': 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+
+
+def drive(check, logins, clients):
+    """Запускает clients потоков, которые вместе выполняют logins проверок"""
+    latencies, rejected = [], []
+    lock = threading.Lock()
+
+    def client(count):
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                check()
+            except Exception:
+                with lock:
+                    rejected.append(1)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(logins // clients,)) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {**summarize(latencies, time.perf_counter() - started), 'rejected': len(rejected)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--max-pending', type=int, default=None, help='По умолчанию равно числу клиентов')
+    parser.add_argument('--hashers', nargs='+', default=list(HASHERS), choices=list(HASHERS))
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.hashers import get_hasher
+    from django.test.utils import override_settings
+    from api.hashing import HashingExecutor, _check
+
+    results = []
+    with override_settings(PASSWORD_HASHERS=list(HASHERS.values())):
+        for name in args.hashers:
+            encoded = get_hasher(name).encode('Pass1_', get_hasher(name).salt())
+            runs = [('inline', None)] + [(f'pool-{w}', w) for w in args.workers]
+            for label, workers in runs:
+                if workers is None:
+                    result = drive(lambda: _check('Pass1_', encoded), args.logins, args.clients)
+                else:
+                    executor = HashingExecutor(workers, args.max_pending or args.clients)
+                    result = drive(lambda: executor.run(_check, 'Pass1_', encoded), args.logins, args.clients)
+                    executor.shutdown()
+                results.append({'hasher': name, 'mode': label, **result})
+                print(f"{name:14} {label:8} {result['throughput_rps']:>9} logins/s "
+                      f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms rejected={result['rejected']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Сравнение сериализаторов DRF и api.fast_serializers.
+
+Для каждого размера выборки замеряется полный путь чтения: запрос к БД,
+сериализация и рендеринг JSON:
+
+    python -m benchmarks.serializers --rows 10 1000 100000 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.utils import benchmark_database, create_catalog, setup_django
+
+
+def create_enrollments(rows):
+    """rows записей: студенты x курсы"""
+    from students.models import Enrollment
+    from users.models import User
+
+    courses = create_catalog(courses=min(rows, 1000), lessons=0)
+    users = User.objects.bulk_create(
+        User(username=f'st{i}@mail.ru', email=f'st{i}@mail.ru', password='!')
+        for i in range(-(-rows // len(courses)))
+    )
+    pairs = ((user, course) for user in users for course in courses)
+    Enrollment.objects.bulk_create(
+        (Enrollment(user=user, course=course, order_id=f'o{user.pk}-{course.pk}') for user, course in pairs),
+        batch_size=2000,
+    )
+    return Enrollment.objects.for_listing()[:rows]
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import RequestFactory
+    from rest_framework.renderers import JSONRenderer
+    from api.fast_serializers import FastEnrollmentSerializer
+    from api.serializers import EnrollmentSerializer
+    from courses.models import Course
+    from students.models import Enrollment
+    from users.models import User
+
+    renderer = JSONRenderer()
+    request = RequestFactory().get('/school-api/orders')
+    variants = {
+        'drf': lambda qs: EnrollmentSerializer(qs, many=True, context={'request': request}).data,
+        'fast_objects': lambda qs: FastEnrollmentSerializer(qs, many=True, context={'request': request}).data,
+        'fast_values': lambda qs: FastEnrollmentSerializer(
+            FastEnrollmentSerializer.values(qs), many=True, context={'request': request},
+        ).data,
+    }
+
+    results = []
+    with benchmark_database():
+        for rows in args.rows:
+            Enrollment.objects.all().delete()
+            Course.objects.all().delete()
+            User.objects.all().delete()
+            queryset = create_enrollments(rows)
+            outputs = {name: renderer.render(fn(queryset.all())) for name, fn in variants.items()}
+            assert len(set(outputs.values())) == 1, 'Сериализаторы дают разный JSON'
+
+            result = {'rows': rows}
+            for name, fn in variants.items():
+                result[f'{name}_ms'] = measure(lambda: renderer.render(fn(queryset.all())), args.repeat)
+            result['speedup'] = round(result['drf_ms'] / result['fast_values_ms'], 1)
+            results.append(result)
+            print(f"{rows:>7} строк: drf {result['drf_ms']} мс, fast (объекты) {result['fast_objects_ms']} мс, "
+                  f"fast (values) {result['fast_values_ms']} мс, ускорение x{result['speedup']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
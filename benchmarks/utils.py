@@ -0,0 +1,130 @@
+"""Общие средства бенчмарков: окружение Django, временная БД и данные"""
+import datetime
+import os
+import statistics
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Настраивает Django для запуска из командной строки"""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def benchmark_database():
+    """Временная тестовая БД на время бенчмарка"""
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def create_student(email='bench@mail.ru'):
+    """Пользователь с токеном"""
+    from rest_framework.authtoken.models import Token
+    from users.models import User
+
+    user = User.objects.create_user(username=email, email=email, password='Pass1_')
+    return user, Token.objects.create(user=user)
+
+
+def create_catalog(courses=20, lessons=5):
+    """Курсы с уроками (не больше 5 уроков на курс)"""
+    from courses.models import Course, Lesson
+
+    start = datetime.date.today() + datetime.timedelta(days=30)
+    objs = Course.objects.bulk_create(
+        Course(
+            name=f'Курс {i}', description='Описание', hours=8, price=1000,
+            start_date=start, end_date=start + datetime.timedelta(days=30), img='courses/bench.jpg',
+        )
+        for i in range(courses)
+    )
+    Lesson.objects.bulk_create(
+        Lesson(course=course, name=f'Урок {j}', text_content='Текст урока', hours=2)
+        for course in objs for j in range(min(lessons, 5))
+    )
+    Course.rebuild_lesson_counters()
+    return objs
+
+
+def summarize(latencies, elapsed):
+    """Сводка по задержкам (мс) и пропускной способности"""
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
+
+
+def create_fixtures(users=100, courses=50, enrollments_per_user=3, password='Pass1_'):
+    """Синтетические данные школы заданного масштаба.
+
+    У курсов от 1 до 5 уроков, записи студентов равномерно распределены по
+    статусам pending/success/failed, оплаченным выдан сертификат. Пароль у
+    всех студентов один, хешируется один раз.
+    """
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+    from courses.models import Course, Lesson
+    from courses.search import rebuild_index
+    from students.certificates import certificate_registry
+    from students.models import Enrollment
+    from users.models import User
+
+    start = datetime.date.today() + datetime.timedelta(days=30)
+    course_objs = Course.objects.bulk_create(
+        Course(
+            name=f'Курс {i}', description='Описание', hours=8, price=1000 + i,
+            start_date=start, end_date=start + datetime.timedelta(days=30), img='courses/bench.jpg',
+        )
+        for i in range(courses)
+    )
+    Lesson.objects.bulk_create(
+        (Lesson(course=course, name=f'Урок {j}', text_content='Текст урока', hours=2)
+         for i, course in enumerate(course_objs) for j in range(i % 5 + 1)),
+        batch_size=2000,
+    )
+    Course.rebuild_lesson_counters()
+    rebuild_index()
+
+    encoded = make_password(password)
+    user_objs = User.objects.bulk_create(
+        (User(username=f'st{i}@mail.ru', email=f'st{i}@mail.ru', password=encoded) for i in range(users)),
+        batch_size=2000,
+    )
+    tokens = Token.objects.bulk_create(
+        (Token(user=user, key=Token.generate_key()) for user in user_objs), batch_size=2000,
+    )
+    statuses = ('pending', 'success', 'failed')
+    per_user = min(enrollments_per_user, courses)
+    Enrollment.objects.bulk_create(
+        (
+            Enrollment(
+                user=user, course=course_objs[(i + j) % courses],
+                status=statuses[(i + j) % 3], order_id=f'o{user.pk}-{j}',
+            )
+            for i, user in enumerate(user_objs) for j in range(per_user)
+        ),
+        batch_size=2000,
+    )
+    certificate_registry.issue_many(Enrollment.objects.filter(status='success'))
+    return {
+        'courses': [course.pk for course in course_objs],
+        'users': [(user.email, token.key) for user, token in zip(user_objs, tokens)],
+    }
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,11 +69,54 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Профиль SQLite для конкурентной нагрузки: WAL не дает записи блокировать
+# чтение, busy timeout ждет блокировку вместо ошибки, synchronous=NORMAL
+# безопасен в режиме WAL, IMMEDIATE-транзакции сразу берут блокировку записи.
+SQLITE_OPTIONS = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+}
+
+DB_NAME = os.environ.get('SCHOOL_API_DB', BASE_DIR / 'db.sqlite3')
+
 DATABASES = {
+    # SCHOOL_API_DB позволяет запустить сервер на другой БД (benchmarks.load_test).
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': DB_NAME,
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Тестовая БД в файле: в общей in-memory БД конкурентные записи
+        # падают с "table is locked" вместо ожидания блокировки. Файл лежит
+        # во временном каталоге, а не в репозитории.
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), 'school_api_test_db.sqlite3')},
+    },
+    # Реплика для чтения (api.routing). Пока SCHOOL_API_REPLICA_DB не задан,
+    # она совпадает с default и маршрутизация выключена.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SCHOOL_API_REPLICA_DB', DB_NAME),
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['api.routing.ReplicaRouter']
+
+REPLICA_ROUTING = {
+    'ALIAS': 'replica',
+    'APPS': ('courses', 'students'),
+    # Сколько секунд после своей записи пользователь читает с основной БД.
+    'STICKY_SECONDS': 10,
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -87,6 +134,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Пароль проверяется в пуле хеширования (api.hashing)
+AUTHENTICATION_BACKENDS = ['api.hashing.PooledHashingBackend']
+
+# Пул для хеширования паролей при регистрации и входе (api.hashing)
+PASSWORD_HASHING = {
+    'WORKERS': 4,
+    'MAX_PENDING': 32,
+}
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -101,17 +157,89 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    # Обложки хранятся под именами по хешу содержимого: одинаковое имя
+    # означает одинаковое содержимое, поэтому перезапись безопасна и
+    # не плодит копий с суффиксами.
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'allow_overwrite': True},
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'api.authentication.BearerTokenAuthentication',
+        'api.authentication.CachedBearerTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
     'PAGE_SIZE': 5,
     'EXCEPTION_HANDLER': 'api.exceptions.custom_exception_handler',
 }
 
+COURSE_IMAGES = {
+    'SIZES': {'small': 150, 'medium': 300, 'large': 600},
+    'DEFAULT_SIZE': 'medium',
+    'WEBP': True,
+    'QUALITY': 85,
+    'WORKERS': 2,
+    'ASYNC': True,
+}
+
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+}
+
+# 'sync' - статус применяется сразу, 'queued' - событие кладется в очередь,
+# которую разбирает manage.py process_payment_events
+PAYMENT_WEBHOOK = {
+    'MODE': 'sync',
+    'BATCH_SIZE': 500,
+}
+
+# Очистка брошенных неоплаченных записей (students.reaper):
+# manage.py reap_enrollments по cron или отдельный процесс reap_enrollments --loop.
+ENROLLMENT_REAPER = {
+    'MAX_AGE_DAYS': 7,
+    'STATUSES': ('pending', 'failed'),
+    'ARCHIVE': True,
+    'BATCH_SIZE': 500,
+    'PAUSE': 0.05,
+    # Период для manage.py reap_enrollments --loop, с
+    'INTERVAL': None,
+}
+
+CERTIFICATE_REGISTRY = {
+    'TTL': 300,
+    'FALSE_POSITIVE_RATE': 0.001,
+}
+
+CATALOG_CACHE = {
+    'BACKEND': 'api.cache.LocMemBackend',
+    'TIMEOUT': 300,
+    'OPTIONS': {'max_entries': 1000},
+    # 'BACKEND': 'api.cache.FileBackend',
+    # 'OPTIONS': {'location': BASE_DIR / 'cache' / 'catalog'},
+    # 'BACKEND': 'api.cache.RedisBackend',
+    # 'OPTIONS': {'url': 'redis://localhost:6379/0'},
+}
+
+# Замеры запросов: Server-Timing и гистограммы на /metrics.
+# SAMPLE_RATE - доля замеряемых запросов (0..1).
+PERFORMANCE_METRICS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,
+    'SERVER_TIMING': True,
+    # Без токена и списка адресов /metrics отключен.
+    'TOKEN': os.environ.get('SCHOOL_API_METRICS_TOKEN'),
+    'ALLOWED_IPS': (),
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/course-admin/courses/course/'
@@ -1,12 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from api.media import MediaView
+from api.metrics import MetricsView
 
 urlpatterns = [
     path('course-admin/', admin.site.urls),
     path('school-api/', include('api.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", MediaView.as_view(), name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
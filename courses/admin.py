@@ -1,4 +1,8 @@
 from django.contrib import admin
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from api.pagination import EstimatedCountPaginator
 from .models import Course, Lesson
 
 class LessonInline(admin.StackedInline):
@@ -7,11 +11,36 @@ class LessonInline(admin.StackedInline):
     extra = 0
     max_num = 5
 
+class AvailabilityFilter(admin.SimpleListFilter):
+    """Курсы, открытые для записи (по индексу course_dates_idx)"""
+    title = 'запись'
+    parameter_name = 'available'
+
+    def lookups(self, request, model_admin):
+        return (('1', 'Открыта'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.available(timezone.now().date())
+        return queryset
+
 class CourseAdmin(admin.ModelAdmin):
     """Административная панель для управления курсами"""
-    list_display = ('name', 'description', 'hours', 'price', 'start_date', 'end_date')
+    list_display = (
+        'name', 'description', 'hours', 'lesson_count', 'price', 'start_date', 'end_date', 'get_enrollments',
+    )
     list_per_page = 5
+    search_fields = ('name',)
+    list_filter = (AvailabilityFilter,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [LessonInline]
 
+    def get_enrollments(self, obj):
+        """Ссылка на записи курса в списке записей."""
+        url = reverse('admin:students_enrollment_changelist')
+        return format_html('<a href="{}?course={}">Записи</a>', url, obj.pk)
+    get_enrollments.short_description = 'Записи'
+
 admin.site.register(Course, CourseAdmin)
 admin.site.register(Lesson)
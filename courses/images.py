@@ -0,0 +1,116 @@
+"""Фоновая обработка обложек курсов"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COURSE_IMAGES = {
+    'SIZES': {'small': 150, 'medium': 300, 'large': 600},
+    'DEFAULT_SIZE': 'medium',
+    'WEBP': False,
+    'QUALITY': 85,
+    'WORKERS': 2,
+    'ASYNC': True,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULT_COURSE_IMAGES, **getattr(settings, 'COURSE_IMAGES', {})}
+
+
+def content_hash(content):
+    """Первые 20 символов sha256 содержимого (bytes или File)"""
+    digest = hashlib.sha256()
+    if isinstance(content, bytes):
+        digest.update(content)
+    else:
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+    return digest.hexdigest()[:20]
+
+
+def variant_name(name, content, ext):
+    """Имя файла варианта по хешу: courses/x.jpg -> courses/variants/<хеш>.jpg"""
+    return os.path.join(os.path.dirname(name), 'variants', f'{content_hash(content)}.{ext}')
+
+
+def render_variant(data, size, fmt, quality):
+    """Уменьшенная копия изображения; JPEG декодируется сразу в нужном масштабе"""
+    im = Image.open(BytesIO(data))
+    if im.format == 'JPEG':
+        im.draft('RGB', (size, size))
+    im = im.convert('RGB')
+    im.thumbnail((size, size))
+    buffer = BytesIO()
+    im.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def build_variants(field):
+    """Создает все варианты обложки в хранилище, возвращает {метка: имя файла}"""
+    config = get_config()
+    with field.storage.open(field.name, 'rb') as f:
+        data = f.read()
+
+    formats = [('jpg', 'JPEG', '')]
+    if config['WEBP']:
+        formats.append(('webp', 'WEBP', '.webp'))
+
+    variants = {}
+    for label, size in config['SIZES'].items():
+        for ext, fmt, suffix in formats:
+            content = render_variant(data, size, fmt, config['QUALITY'])
+            name = variant_name(field.name, content, ext)
+            variants[label + suffix] = field.storage.save(name, ContentFile(content))
+    return variants
+
+
+def process_course_image(course_id, name):
+    """Обрабатывает обложку курса и сохраняет список вариантов"""
+    from .models import Course
+
+    try:
+        course = Course.objects.get(pk=course_id)
+        if course.img.name != name:
+            return
+        course.img_variants = build_variants(course.img)
+        course.save(update_fields=['img_variants', 'updated_at'])
+    except Course.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception('Не удалось обработать обложку курса %s (%s)', course_id, name)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_config()['WORKERS'], thread_name_prefix='course-images',
+            )
+        return _executor
+
+
+def submit_course_image(course_id, name):
+    """Ставит обработку обложки в пул (или выполняет сразу, если ASYNC выключен)"""
+    if get_config()['ASYNC']:
+        return get_executor().submit(process_course_image, course_id, name)
+    process_course_image(course_id, name)
+
+
+def schedule_course_image(course):
+    """Запускает обработку после фиксации транзакции"""
+    course_id, name = course.pk, course.img.name
+    transaction.on_commit(lambda: submit_course_image(course_id, name))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from courses.images import process_course_image
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    """Построение вариантов обложек для уже загруженных курсов"""
+    help = 'Строит варианты обложек курсов (по умолчанию только отсутствующие)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Перестроить варианты у всех курсов')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.exclude(img='')
+        if not options['all']:
+            courses = courses.filter(img_variants={})
+        count = 0
+        for pk, name in courses.values_list('pk', 'img').iterator():
+            process_course_image(pk, name)
+            count += 1
+        self.stdout.write(f'Обработано курсов: {count}')
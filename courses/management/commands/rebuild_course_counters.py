@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    """Пересчет счетчиков уроков курсов"""
+    help = 'Исправляет разошедшиеся lesson_count и lesson_hours у курсов'
+
+    def handle(self, *args, **options):
+        fixed = Course.rebuild_lesson_counters()
+        self.stdout.write(f'Исправлено курсов: {fixed}')
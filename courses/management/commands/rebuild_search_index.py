@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+from courses.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """Перестроение поискового индекса курсов"""
+    help = 'Заново строит полнотекстовый индекс курсов и уроков'
+
+    def handle(self, *args, **options):
+        try:
+            count = rebuild_index()
+        except NotSupportedError as exc:
+            raise CommandError(exc)
+        self.stdout.write(f'Проиндексировано курсов: {count}')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='img_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты обложки'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+def create_catalog_version(apps, schema_editor):
+    apps.get_model('courses', 'CatalogVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_img_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменен'),
+        ),
+        migrations.RunPython(create_catalog_version, migrations.RunPython.noop),
+    ]
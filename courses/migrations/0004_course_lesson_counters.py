@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_lesson_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    courses = list(Course.objects.annotate(
+        actual_count=Count('lessons'), actual_hours=Coalesce(Sum('lessons__hours'), 0),
+    ).filter(actual_count__gt=0))
+    for course in courses:
+        course.lesson_count, course.lesson_hours = course.actual_count, course.actual_hours
+    Course.objects.bulk_update(courses, ['lesson_count', 'lesson_hours'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество уроков'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lesson_hours',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Часов в уроках'),
+        ),
+        migrations.RunPython(fill_lesson_counters, migrations.RunPython.noop),
+    ]
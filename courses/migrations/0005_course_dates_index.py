@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_lesson_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['start_date', 'end_date'], name='course_dates_idx'),
+        ),
+    ]
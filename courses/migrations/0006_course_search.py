@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# Таблица и SQL те же, что в courses.search на момент миграции: миграция
+# не зависит от текущего кода модуля.
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS courses_course_search USING fts5("
+    "name, description, lessons, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+SQLITE_FILL = (
+    "INSERT INTO courses_course_search (rowid, name, description, lessons) "
+    "SELECT c.id, c.name, c.description, COALESCE(("
+    "SELECT group_concat(l.name || char(10) || l.text_content, char(10)) "
+    "FROM courses_lesson l WHERE l.course_id = c.id), '') "
+    "FROM courses_course c"
+)
+POSTGRES_CREATE = (
+    "CREATE TABLE IF NOT EXISTS courses_course_search ("
+    "course_id bigint PRIMARY KEY REFERENCES courses_course (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS courses_course_search_document ON courses_course_search USING GIN (document)",
+)
+POSTGRES_FILL = (
+    "INSERT INTO courses_course_search (course_id, document) "
+    "SELECT c.id, setweight(to_tsvector('simple', c.name), 'A') || "
+    "setweight(to_tsvector('simple', c.description), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(string_agg(l.name || ' ' || l.text_content, ' '), '')), 'C') "
+    "FROM courses_course c LEFT JOIN courses_lesson l ON l.course_id = c.id GROUP BY c.id"
+)
+
+
+def has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and has_fts5(schema_editor):
+        statements = (SQLITE_CREATE, SQLITE_FILL)
+    elif vendor == 'postgresql':
+        statements = (*POSTGRES_CREATE, POSTGRES_FILL)
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS courses_course_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_dates_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
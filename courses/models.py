@@ -1,16 +1,34 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator, FileExtensionValidator
 import os
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
-import uuid
+from .images import content_hash, schedule_course_image
+
+MAX_LESSONS = 5
 
 def course_image_path(instance, filename):
-    ext = filename.split('.')[-1]
-    new_filename = f"mpic_{uuid.uuid4().hex[:8]}.{ext}"
-    return os.path.join('courses/', new_filename)
+    """Имя обложки по хешу содержимого: новый файл - новый адрес"""
+    ext = filename.split('.')[-1].lower()
+    return os.path.join('courses/', f"{content_hash(instance.img.file)}.{ext}")
+
+def available_q(today):
+    """Условие записи на курс: курс еще не начался и не закончился"""
+    return Q(start_date__gt=today, end_date__gte=today)
+
+
+class CourseQuerySet(models.QuerySet):
+    """Выборки курсов"""
+
+    def available(self, today):
+        """Курсы, на которые еще можно записаться"""
+        return self.filter(available_q(today))
+
+    def with_availability(self, today):
+        """Поле is_available по тому же условию, что и available()"""
+        return self.annotate(is_available=ExpressionWrapper(available_q(today), output_field=models.BooleanField()))
+
 
 class Course(models.Model):
     """Модель курса"""
@@ -32,6 +50,17 @@ class Course(models.Model):
         validators=[FileExtensionValidator(['jpg', 'jpeg'])],
         verbose_name="Обложка курса"
     )
+    img_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Варианты обложки")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Изменен")
+    lesson_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество уроков")
+    lesson_hours = models.PositiveIntegerField(default=0, editable=False, verbose_name="Часов в уроках")
+
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'end_date'], name='course_dates_idx'),
+        ]
 
     def clean(self):
         """Валидация данных модели"""
@@ -44,28 +73,13 @@ class Course(models.Model):
                 pass 
 
     def save(self, *args, **kwargs):
-        """Сохранение модели"""
-        
-        if self.img:
-            
-            try:
-                im = Image.open(self.img)
-                if im.height > 300 or im.width > 300:
-                    output_size = (300, 300)
-                    im.thumbnail(output_size)
-                    
-                    
-                    buffer = BytesIO()
-                    im.save(buffer, format='JPEG')
-                    val = buffer.getvalue()
-                    
-                    
-                    
-                    self.img.save(self.img.name, ContentFile(val), save=False)
-            except Exception as e:
-                pass 
-        
+        """Сохранение модели; варианты обложки строятся в фоне (courses.images)"""
+        img_changed = bool(self.img) and not self.img._committed
+        if img_changed or not self.img:
+            self.img_variants = {}
         super().save(*args, **kwargs)
+        if img_changed:
+            schedule_course_image(self)
 
     def delete(self, *args, **kwargs):
         """Удаление курса"""
@@ -77,6 +91,23 @@ class Course(models.Model):
         """Возвращает строковое представление курса (название)."""
         return self.name
 
+    @classmethod
+    def rebuild_lesson_counters(cls, queryset=None):
+        """Пересчитывает разошедшиеся счетчики уроков, возвращает число исправленных курсов"""
+        queryset = cls.objects.all() if queryset is None else queryset
+        drifted = list(
+            queryset.annotate(
+                actual_count=Count('lessons'),
+                actual_hours=Coalesce(Sum('lessons__hours'), 0),
+            )
+            .exclude(lesson_count=F('actual_count'), lesson_hours=F('actual_hours'))
+            .only('pk')
+        )
+        for course in drifted:
+            course.lesson_count, course.lesson_hours = course.actual_count, course.actual_hours
+        cls.objects.bulk_update(drifted, ['lesson_count', 'lesson_hours'], batch_size=500)
+        return len(drifted)
+
 class Lesson(models.Model):
     """Модель урока"""
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
@@ -98,23 +129,56 @@ class Lesson(models.Model):
         
         
         if not self.pk:
-            if self.course.lessons.count() >= 5:
+            if self.course.lesson_count >= MAX_LESSONS:
                 raise ValidationError("Курс не может содержать более 5 уроков.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает курс и часы урока для пересчета счетчиков при сохранении"""
+        instance = super().from_db(db, field_names, values)
+        instance._counted = (instance.__dict__.get('course_id'), instance.__dict__.get('hours'))
+        return instance
+
     def save(self, *args, **kwargs):
-        """Сохранение урока с дополнительной проверкой количества."""
-        if not self.pk:
-             
-             if self.course.lessons.count() >= 5:
-                 pass 
-        super().save(*args, **kwargs)
+        """Сохранение урока с проверкой количества по счетчику курса.
+
+        Сообщение пользователю дает clean(); здесь - ограничение на уровне БД
+        на случай гонки или сохранения в обход формы, поэтому IntegrityError.
+        Счетчики курса обновляются сигналом в той же транзакции.
+        """
+        with transaction.atomic():
+            if self._state.adding:
+                count = (
+                    Course.objects.select_for_update().filter(pk=self.course_id)
+                    .values_list('lesson_count', flat=True).first()
+                )
+                if count is not None and count >= MAX_LESSONS:
+                    raise IntegrityError(f'Курс {self.course_id} уже содержит {MAX_LESSONS} уроков')
+            super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
         """Удаление урока"""
         if self.course.enrollments.exists():
             raise ValidationError("Нельзя удалить урок, если на курс записаны студенты.")
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         """Возвращает строковое представление урока (название)."""
         return self.name
+
+
+class CatalogVersion(models.Model):
+    """Версия каталога: растет при любом изменении курсов и уроков"""
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Версия")
+
+    @classmethod
+    def current(cls):
+        """Текущая версия одним запросом по первичному ключу"""
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """Увеличивает версию каталога"""
+        if not cls.objects.filter(pk=1).update(version=models.F('version') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
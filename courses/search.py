@@ -0,0 +1,208 @@
+"""Полнотекстовый поиск курсов.
+
+Индекс - отдельная таблица с документом на каждый курс: название и
+описание курса, названия и тексты его уроков. На SQLite это виртуальная
+таблица FTS5 (ранжирование bm25), на PostgreSQL - таблица с tsvector и
+GIN-индексом (ts_rank). Таблицу создает миграция; SQLite без FTS5 поиск
+не поддерживает. Индекс обновляется сигналами (courses.signals) и
+при импорте (api.dataio); целиком перестраивается командой
+``manage.py rebuild_search_index``.
+
+Поиск выполняется одним запросом: индекс соединяется с таблицей курсов
+и сортируется по релевантности. Каждое слово запроса ищется по префиксу.
+"""
+import re
+from django.db import NotSupportedError, connections, router
+from .models import Course, Lesson
+
+TABLE = 'courses_course_search'
+WORD_RE = re.compile(r'\w+')
+# Веса при ранжировании: название, описание, уроки.
+WEIGHTS = (10.0, 4.0, 1.0)
+BATCH_SIZE = 500
+
+
+class SQLiteBackend:
+    """Виртуальная таблица FTS5, rowid совпадает с id курса"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"name, description, lessons, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def delete(self, cursor, course_ids):
+        placeholders = ', '.join(['%s'] * len(course_ids))
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', list(course_ids))
+
+    def insert(self, cursor, documents):
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, name, description, lessons) VALUES (%s, %s, %s, %s)', documents,
+        )
+
+    def match(self, words):
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search_sql(self):
+        weights = ', '.join(map(str, WEIGHTS))
+        return (
+            f'SELECT c.* FROM {TABLE} s JOIN courses_course c ON c.id = s.rowid '
+            f'WHERE {TABLE} MATCH %s ORDER BY bm25({TABLE}, {weights}), c.id LIMIT %s OFFSET %s'
+        )
+
+    def count_sql(self):
+        return f'SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s'
+
+
+class PostgresBackend:
+    """Таблица с tsvector и GIN-индексом"""
+    config = 'simple'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self, cursor):
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+            f'course_id bigint PRIMARY KEY REFERENCES courses_course (id) ON DELETE CASCADE, '
+            f'document tsvector NOT NULL)'
+        )
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING GIN (document)')
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def delete(self, cursor, course_ids):
+        cursor.execute(f'DELETE FROM {TABLE} WHERE course_id = ANY(%s)', [list(course_ids)])
+
+    def insert(self, cursor, documents):
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (course_id, document) VALUES (%s, "
+            f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'B') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'C'))",
+            documents,
+        )
+
+    def match(self, words):
+        return ' & '.join(f'{word}:*' for word in words)
+
+    def search_sql(self):
+        # ts_rank принимает веса от 0 до 1 в порядке {D, C, B, A}.
+        weights = ', '.join(str(weight / max(WEIGHTS)) for weight in reversed(WEIGHTS))
+        return (
+            f"SELECT c.* FROM {TABLE} s JOIN courses_course c ON c.id = s.course_id, "
+            f"to_tsquery('{self.config}', %s) q WHERE s.document @@ q "
+            f"ORDER BY ts_rank('{{0, {weights}}}', s.document, q) DESC, c.id LIMIT %s OFFSET %s"
+        )
+
+    def count_sql(self):
+        return f"SELECT count(*) FROM {TABLE} WHERE document @@ to_tsquery('{self.config}', %s)"
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+# Собран ли SQLite с FTS5, по псевдонимам подключений.
+_fts5 = {}
+
+
+def has_fts5(connection):
+    if connection.alias not in _fts5:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            _fts5[connection.alias] = bool(cursor.fetchone()[0])
+    return _fts5[connection.alias]
+
+
+def is_supported(connection):
+    if connection.vendor == 'sqlite':
+        return has_fts5(connection)
+    return connection.vendor in BACKENDS
+
+
+def get_backend(connection):
+    if not is_supported(connection):
+        raise NotSupportedError(f'Поиск курсов не поддерживается для {connection.vendor}')
+    return BACKENDS[connection.vendor](connection)
+
+
+def create_index(connection):
+    with connection.cursor() as cursor:
+        get_backend(connection).create(cursor)
+
+
+def drop_index(connection):
+    with connection.cursor() as cursor:
+        get_backend(connection).drop(cursor)
+
+
+def index_courses(course_ids, using=None):
+    """Пересобирает документы курсов; удаленные курсы убираются из индекса"""
+    course_ids = sorted(set(course_ids))
+    if not course_ids:
+        return
+    using = using or router.db_for_write(Course)
+    connection = connections[using]
+    if not is_supported(connection):
+        return
+    backend = get_backend(connection)
+    for start in range(0, len(course_ids), BATCH_SIZE):
+        batch = course_ids[start:start + BATCH_SIZE]
+        lessons = {}
+        rows = Lesson.objects.using(using).filter(course_id__in=batch).order_by('pk')
+        for course_id, name, text in rows.values_list('course_id', 'name', 'text_content'):
+            lessons.setdefault(course_id, []).extend((name, text))
+        documents = [
+            (pk, name, description, '\n'.join(lessons.get(pk, ())))
+            for pk, name, description in Course.objects.using(using).filter(pk__in=batch)
+            .values_list('pk', 'name', 'description')
+        ]
+        with connection.cursor() as cursor:
+            backend.delete(cursor, batch)
+            if documents:
+                backend.insert(cursor, documents)
+
+
+def rebuild_index(using=None):
+    """Перестраивает индекс всех курсов, возвращает число курсов"""
+    using = using or router.db_for_write(Course)
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        backend = get_backend(connection)
+        backend.drop(cursor)
+        backend.create(cursor)
+    course_ids = list(Course.objects.using(using).values_list('pk', flat=True))
+    index_courses(course_ids, using)
+    return len(course_ids)
+
+
+def search_courses(query, limit, offset=0):
+    """Курсы по релевантности к запросу (RawQuerySet); пустой запрос - пустой список"""
+    words = WORD_RE.findall(query.lower())
+    if not words:
+        return []
+    using = router.db_for_read(Course)
+    backend = get_backend(connections[using])
+    return Course.objects.db_manager(using).raw(backend.search_sql(), [backend.match(words), limit, offset])
+
+
+def count_courses(query):
+    """Число курсов, подходящих под запрос"""
+    words = WORD_RE.findall(query.lower())
+    if not words:
+        return 0
+    connection = connections[router.db_for_read(Course)]
+    backend = get_backend(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(backend.count_sql(), [backend.match(words)])
+        return cursor.fetchone()[0]
@@ -0,0 +1,73 @@
+"""Сигналы курсов"""
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import CatalogVersion, Course, Lesson
+from .search import index_courses
+
+SEARCH_FIELDS = {'name', 'description'}
+
+
+@receiver([post_save, post_delete], sender=Course)
+def bump_catalog_version(sender, **kwargs):
+    """Изменение курса меняет версию каталога"""
+    CatalogVersion.bump()
+
+
+@receiver([post_save, post_delete], sender=Course)
+def index_course(sender, instance, update_fields=None, **kwargs):
+    """Обновляет документ курса в поисковом индексе"""
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        index_courses([instance.pk], using=kwargs['using'])
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def index_lesson(sender, instance, **kwargs):
+    """Урок входит в документ своего курса и прежнего, если курс сменился.
+
+    Подключен раньше lesson_saved, пока _counted хранит прежний курс.
+    """
+    previous = getattr(instance, '_counted', (None, None))[0]
+    index_courses({instance.course_id, previous} - {None}, using=kwargs['using'])
+
+
+def update_course(course_id, count=0, hours=0):
+    """Сдвигает счетчики уроков курса и отмечает курс измененным"""
+    Course.objects.filter(pk=course_id).update(
+        lesson_count=Greatest(F('lesson_count') + count, 0),
+        lesson_hours=Greatest(F('lesson_hours') + hours, 0),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created, **kwargs):
+    """Новый или измененный урок обновляет счетчики, версию курса и каталога"""
+    if created:
+        update_course(instance.course_id, 1, instance.hours)
+    else:
+        counted = getattr(instance, '_counted', (None, None))
+        if None in counted:
+            Course.rebuild_lesson_counters(Course.objects.filter(pk=instance.course_id))
+            update_course(instance.course_id)
+        elif counted[0] != instance.course_id:
+            update_course(counted[0], -1, -counted[1])
+            update_course(instance.course_id, 1, instance.hours)
+        else:
+            update_course(instance.course_id, 0, instance.hours - counted[1])
+    instance._counted = (instance.course_id, instance.hours)
+    CatalogVersion.bump()
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, **kwargs):
+    """Удаление урока уменьшает счетчики курса"""
+    course_id, hours = getattr(instance, '_counted', (instance.course_id, instance.hours))
+    if hours is None:
+        update_course(course_id)
+        Course.rebuild_lesson_counters(Course.objects.filter(pk=course_id))
+    else:
+        update_course(course_id, -1, -hours)
+    CatalogVersion.bump()
@@ -1 +1,729 @@
-from django.test import TestCase
\ No newline at end of file
+import datetime
+import json
+import os
+import tempfile
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from io import BytesIO, StringIO
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from PIL import Image
+from django.db import IntegrityError, NotSupportedError, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api.cache import CatalogCache, FileBackend, InMemoryRedis, LocMemBackend, RedisBackend, catalog_cache
+from api.dataio import import_rows
+from api.media import absolute_media_url
+from api.metrics import metrics_registry
+from api.testing import QueryBudgetTestCase
+from courses.images import render_variant
+from courses.models import Course, Lesson
+from courses.search import is_supported, rebuild_index, search_courses
+from students.models import Enrollment
+from students.tests import make_course
+from users.models import User
+
+
+class CatalogTestCase(QueryBudgetTestCase):
+    """Каталог курсов от имени авторизованного студента"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.key}')
+
+
+class CursorPaginationTests(CatalogTestCase):
+    """Курсорная пагинация каталога"""
+
+    def test_pages_cover_catalog_without_count(self):
+        courses = [make_course(f'Курс {i}') for i in range(12)]
+        url, seen = '/school-api/courses/', []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                body = self.assertWithinQueryBudget('get', url).json()
+            sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+            self.assertNotIn('COUNT(', sql)
+            self.assertNotIn('OFFSET', sql)
+            pagination = body['pagination']
+            self.assertEqual((pagination['total'], pagination['current'], pagination['per_page']), (None, None, 5))
+            seen += [item['id'] for item in body['data']]
+            url = pagination['next']
+        self.assertEqual(seen, [course.pk for course in courses])
+
+    def test_total_on_request(self):
+        for i in range(12):
+            make_course(f'Курс {i}')
+        url, pages = '/school-api/courses/?with_total=1', []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                pagination = self.client.get(url).json()['pagination']
+            self.assertEqual(sum('COUNT(' in q['sql'] for q in ctx.captured_queries), 1)
+            self.assertEqual(pagination['total'], 3)
+            pages.append(pagination['current'])
+            url = pagination['next']
+        self.assertEqual(pages, [1, 2, 3])
+        previous = self.client.get(pagination['previous']).json()['pagination']
+        self.assertEqual(previous['current'], 2)
+
+    def test_empty_catalog_envelope(self):
+        body = self.client.get('/school-api/courses/?with_total=1').json()
+        self.assertEqual(body['data'], [])
+        self.assertEqual(body['pagination'], {
+            'total': 1, 'current': 1, 'per_page': 5, 'next': None, 'previous': None,
+        })
+
+
+class ConditionalGetTests(CatalogTestCase):
+    """Ответ 304 по If-None-Match до сериализации"""
+
+    def setUp(self):
+        super().setUp()
+        self.course = make_course()
+        Lesson.objects.create(course=self.course, name='Урок', text_content='Текст', hours=1)
+
+    def assertNotModified(self, url):
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertLessEqual(len(ctx), 1)
+        self.assertNotIn('lesson', ' '.join(q['sql'] for q in ctx.captured_queries))
+        return etag
+
+    def test_list_not_modified(self):
+        etag = self.assertNotModified('/school-api/courses/')
+        make_course('Новый курс')
+        response = self.client.get('/school-api/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 2)
+
+    def test_detail_not_modified(self):
+        url = f'/school-api/courses/{self.course.pk}/'
+        etag = self.assertNotModified(url)
+        Lesson.objects.create(course=self.course, name='Урок 2', text_content='Текст', hours=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query(self):
+        url = '/school-api/courses/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url + '?img_size=small', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncViewsTests(CatalogTestCase):
+    """Async-версии эндпоинтов отдают то же, что и синхронные"""
+
+    def setUp(self):
+        super().setUp()
+        self.courses = [make_course(f'Курс {i}') for i in range(7)]
+        Enrollment.objects.create(user=self.user, course=self.courses[0], order_id='o1')
+        self.headers = {'Authorization': f'Bearer {self.token.key}'}
+
+    async def test_course_list_matches_sync(self):
+        sync_body = (await sync_to_async(self.client.get)('/school-api/courses/')).json()
+        response = await self.async_client.get('/school-api/async/courses', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['data'], sync_body['data'])
+        next_page = await self.async_client.get(body['pagination']['next'], headers=self.headers)
+        self.assertEqual([c['id'] for c in next_page.json()['data']], [c.pk for c in self.courses[5:]])
+
+    async def test_course_list_is_cached_and_paginated_like_sync(self):
+        url = '/school-api/async/courses?page_size=3'
+        first = await self.async_client.get(url, headers=self.headers)
+        second = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual((first['X-Catalog-Cache'], second['X-Catalog-Cache']), ('miss', 'hit'))
+        sync_body = (await sync_to_async(self.client.get)('/school-api/courses/?page_size=3')).json()
+        self.assertEqual(first.json()['pagination']['per_page'], sync_body['pagination']['per_page'])
+        self.assertEqual(parse_qs(urlsplit(first.json()['pagination']['next']).query)['cursor'],
+                         parse_qs(urlsplit(sync_body['pagination']['next']).query)['cursor'])
+
+    async def test_course_detail_not_modified(self):
+        url = f'/school-api/async/courses/{self.courses[0].pk}'
+        etag = (await self.async_client.get(url, headers=self.headers))['ETag']
+        response = await self.async_client.get(url, headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_course_detail_cache_is_shared_with_sync(self):
+        pk = self.courses[0].pk
+        sync_get = sync_to_async(self.client.get)
+        first = await sync_get(f'/school-api/courses/{pk}/')
+        self.assertEqual(first['X-Catalog-Cache'], 'miss')
+        for _ in range(2):
+            response = await self.async_client.get(f'/school-api/async/courses/{pk}', headers=self.headers)
+            self.assertEqual(response['X-Catalog-Cache'], 'hit')
+            self.assertEqual(response.json(), first.json())
+            self.assertEqual((await sync_get(f'/school-api/courses/{pk}/'))['X-Catalog-Cache'], 'hit')
+
+    async def test_orders_match_sync(self):
+        sync_body = (await sync_to_async(self.client.get)('/school-api/orders')).json()
+        response = await self.async_client.get('/school-api/async/orders', headers=self.headers)
+        self.assertEqual(response.json(), sync_body)
+
+    async def test_authentication_errors(self):
+        response = await self.async_client.get('/school-api/async/orders')
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get('/school-api/async/orders', headers={'Authorization': 'Bearer x'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_webhook(self):
+        response = await self.async_client.post(
+            '/school-api/async/payment-webhook', {'order_id': 'o1', 'status': 'success'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual((await Enrollment.objects.aget(order_id='o1')).status, 'success')
+
+
+class LessonCounterTests(CatalogTestCase):
+    """Счетчики уроков курса"""
+
+    def setUp(self):
+        super().setUp()
+        self.course = make_course()
+
+    def add_lesson(self, hours=1, course=None):
+        return Lesson.objects.create(course=course or self.course, name='Урок', text_content='Текст', hours=hours)
+
+    def assertCounters(self, course, count, hours):
+        course.refresh_from_db()
+        self.assertEqual((course.lesson_count, course.lesson_hours), (count, hours))
+
+    def test_counters_follow_lessons(self):
+        first, second = self.add_lesson(2), self.add_lesson(3)
+        self.assertCounters(self.course, 2, 5)
+        second.hours = 1
+        second.save()
+        self.assertCounters(self.course, 2, 3)
+        other = make_course('Другой курс')
+        first = Lesson.objects.get(pk=first.pk)
+        first.course = other
+        first.save()
+        self.assertCounters(self.course, 1, 1)
+        self.assertCounters(other, 1, 2)
+        Lesson.objects.get(pk=second.pk).delete()
+        self.assertCounters(self.course, 0, 0)
+
+    def test_limit_uses_counter(self):
+        for _ in range(5):
+            self.add_lesson()
+        lesson = Lesson(course=Course.objects.get(pk=self.course.pk), name='Урок', text_content='Текст', hours=1)
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(ValidationError):
+                lesson.clean()
+        self.assertEqual(len(ctx), 0)
+        with self.assertRaises(IntegrityError):
+            lesson.save()
+        self.assertCounters(self.course, 5, 5)
+
+    def test_admin_reports_limit_as_form_error(self):
+        for _ in range(5):
+            self.add_lesson()
+        admin = User.objects.create_superuser(username='admin@mail.ru', email='admin@mail.ru', password='Pass1_')
+        self.client.force_login(admin)
+        response = self.client.post('/course-admin/courses/lesson/add/', {
+            'course': self.course.pk, 'name': 'Урок 6', 'text_content': 'Текст', 'hours': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Курс не может содержать более 5 уроков.')
+        self.assertCounters(self.course, 5, 5)
+
+    def test_catalog_exposes_counters(self):
+        self.add_lesson(2)
+        item = self.client.get('/school-api/courses/').json()['data'][0]
+        self.assertEqual((item['lesson_count'], item['lesson_hours']), (1, 2))
+
+    def test_rebuild_command_fixes_drift(self):
+        self.add_lesson(2)
+        Course.objects.filter(pk=self.course.pk).update(lesson_count=4, lesson_hours=0)
+        out = StringIO()
+        call_command('rebuild_course_counters', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertCounters(self.course, 1, 2)
+
+
+class DataImportExportTests(CatalogTestCase):
+    """Команды import_data и export_data"""
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def path(self, name, content=None):
+        path = os.path.join(self.dir.name, name)
+        if content is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        return path
+
+    def call(self, *args):
+        out = StringIO()
+        call_command(*args, stdout=out)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        course = make_course()
+        Lesson.objects.create(course=course, name='Урок', text_content='Текст', hours=2)
+        Enrollment.objects.create(user=self.user, course=course, order_id='o1', status='success')
+        for dataset, fmt in [('courses', 'csv'), ('lessons', 'jsonl'), ('enrollments', 'csv')]:
+            self.call('export_data', dataset, self.path(f'{dataset}.{fmt}'), '--chunk-size', '1')
+        exported = open(self.path('enrollments.csv'), encoding='utf-8').read()
+        Course.objects.all().update(name='Старое')
+        Enrollment.objects.all().update(status='pending', order_id=None)
+
+        self.call('import_data', 'courses', self.path('courses.csv'), '--no-images')
+        self.call('import_data', 'lessons', self.path('lessons.jsonl'))
+        self.call('import_data', 'enrollments', self.path('enrollments.csv'))
+        course.refresh_from_db()
+        self.assertEqual((course.name, course.lesson_count, course.lesson_hours), ('Курс', 1, 2))
+        self.assertEqual(Enrollment.objects.get().status, 'success')
+        self.call('export_data', 'enrollments', self.path('again.csv'))
+        self.assertEqual(open(self.path('again.csv'), encoding='utf-8').read(), exported)
+
+    def test_import_in_batches(self):
+        lines = [
+            json.dumps({'name': f'Курс {i}', 'hours': 5, 'price': '1000.00', 'start_date': '2030-01-01',
+                        'end_date': '2030-02-01', 'img': 'courses/mpic_test.jpg'})
+            for i in range(7)
+        ]
+        version = self.client.get('/school-api/courses/')['ETag']
+        out = self.call('import_data', 'courses', self.path('courses.jsonl', '\n'.join(lines)),
+                        '--batch-size', '3', '--no-images')
+        self.assertIn('7', out)
+        self.assertEqual(Course.objects.count(), 7)
+        self.assertEqual(self.client.get('/school-api/courses/', HTTP_IF_NONE_MATCH=version).status_code, 200)
+
+    def test_invalid_rows_are_reported(self):
+        path = self.path('courses.csv', 'name,hours,price,start_date,end_date,img\nКурс,50,1000,2030-01-01,2030-02-01,x.jpg\n')
+        with self.assertRaisesMessage(CommandError, 'Строка 1'):
+            self.call('import_data', 'courses', path)
+        path = self.path('enrollments.jsonl', json.dumps({'user': 'nobody@mail.ru', 'course': 1}))
+        with self.assertRaisesMessage(CommandError, 'nobody@mail.ru'):
+            self.call('import_data', 'enrollments', path)
+
+    def test_lesson_limit(self):
+        course = make_course()
+        lines = [json.dumps({'course': course.pk, 'name': 'Урок', 'text_content': 'Текст', 'hours': 1})] * 6
+        with self.assertRaises(CommandError):
+            self.call('import_data', 'lessons', self.path('lessons.jsonl', '\n'.join(lines)))
+        self.assertEqual(Lesson.objects.count(), 0)
+
+    def test_images_are_processed(self):
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media, COURSE_IMAGES={'ASYNC': False, 'SIZES': {'small': 50}}):
+            os.makedirs(os.path.join(media, 'courses'))
+            buffer = BytesIO()
+            Image.new('RGB', (400, 300), 'red').save(buffer, format='JPEG')
+            with open(os.path.join(media, 'courses', 'mpic_new.jpg'), 'wb') as f:
+                f.write(buffer.getvalue())
+            line = json.dumps({'name': 'Курс', 'hours': 5, 'price': 1000, 'start_date': '2030-01-01',
+                               'end_date': '2030-02-01', 'img': 'courses/mpic_new.jpg'})
+            self.call('import_data', 'courses', self.path('courses.jsonl', line))
+            variants = Course.objects.get().img_variants
+            self.assertEqual(list(variants), ['small'])
+            self.assertRegex(variants['small'], r'^courses/variants/[0-9a-f]{20}\.jpg$')
+            self.assertTrue(os.path.exists(os.path.join(media, variants['small'])))
+
+
+class PerformanceMetricsTests(CatalogTestCase):
+    """Server-Timing и метрики Prometheus"""
+
+    def setUp(self):
+        super().setUp()
+        metrics_registry.reset()
+        make_course()
+
+    def timings(self, response):
+        parts = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        return {name: float(value.split('dur=')[1].split(';')[0]) for name, value in parts.items()}, parts
+
+    def test_server_timing(self):
+        self.client.get('/school-api/courses/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/school-api/courses/?img_size=small')
+        timings, parts = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{len(ctx)} queries"', parts['db'])
+        self.assertGreater(timings['serialize'], 0)
+        self.assertGreater(timings['render'], 0)
+        self.assertGreaterEqual(timings['total'], timings['db'] + timings['serialize'] + timings['render'])
+
+    async def test_async_server_timing(self):
+        headers = {'Authorization': f'Bearer {self.token.key}'}
+        response = await self.async_client.get('/school-api/async/courses', headers=headers)
+        timings, parts = self.timings(response)
+        self.assertNotIn('desc="0 queries"', parts['db'])
+        self.assertGreater(timings['render'], 0)
+
+    def test_metrics_endpoint(self):
+        for _ in range(3):
+            self.client.get('/school-api/courses/')
+        self.client.get('/school-api/orders')
+        with override_settings(PERFORMANCE_METRICS={'ALLOWED_IPS': ('127.0.0.1',)}):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('school_api_request_duration_seconds_count{view="courses-list",method="GET"} 3', body)
+        self.assertIn('school_api_db_queries_bucket{view="orders-list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('school_api_responses_total{view="courses-list",method="GET",status="200"} 3', body)
+
+    def test_sampling_and_token(self):
+        with override_settings(PERFORMANCE_METRICS={'SAMPLE_RATE': 0, 'TOKEN': 'secret'}):
+            response = self.client.get('/school-api/courses/')
+            self.assertNotIn('Server-Timing', response)
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertNotIn('courses-list', response.content.decode())
+
+    def test_metrics_disabled_unless_configured(self):
+        with override_settings(PERFORMANCE_METRICS={}):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(PERFORMANCE_METRICS={'ALLOWED_IPS': ('10.0.0.5',)}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+
+def jpeg_bytes(color='red', size=(400, 300)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class CourseImageTests(CatalogTestCase):
+    """Обложки под именами по хешу и их раздача"""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        settings = override_settings(MEDIA_ROOT=self.media, COURSE_IMAGES={'ASYNC': False, 'SIZES': {'small': 50}})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_course(name, img=SimpleUploadedFile('cover.JPG', content, content_type='image/jpeg'))
+
+    def test_names_follow_content(self):
+        first, same = self.upload('Курс 1', jpeg_bytes()), self.upload('Курс 2', jpeg_bytes())
+        other = self.upload('Курс 3', jpeg_bytes('blue'))
+        self.assertRegex(first.img.name, r'^courses/[0-9a-f]{20}\.jpg$')
+        self.assertEqual(first.img.name, same.img.name)
+        self.assertNotEqual(first.img.name, other.img.name)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media, 'courses')))[-1], 'variants')
+        self.assertEqual(len(os.listdir(os.path.join(self.media, 'courses'))), 3)
+
+    @override_settings(COURSE_IMAGES={'ASYNC': False, 'WEBP': True, 'SIZES': {'small': 50, 'medium': 100}})
+    def test_variants_are_built_for_every_size_and_format(self):
+        course = self.upload('Курс', jpeg_bytes(size=(400, 300)))
+        course.refresh_from_db()
+        self.assertEqual(set(course.img_variants), {'small', 'small.webp', 'medium', 'medium.webp'})
+        for key, (width, fmt) in {
+            'small': (50, 'JPEG'), 'small.webp': (50, 'WEBP'), 'medium': (100, 'JPEG'), 'medium.webp': (100, 'WEBP'),
+        }.items():
+            with Image.open(os.path.join(self.media, course.img_variants[key])) as im:
+                self.assertEqual((im.format, im.size), (fmt, (width, round(width * 3 / 4))))
+
+    def test_jpeg_is_decoded_in_draft_mode(self):
+        from PIL.JpegImagePlugin import JpegImageFile
+        with mock.patch.object(JpegImageFile, 'draft', autospec=True, side_effect=JpegImageFile.draft) as draft:
+            data = render_variant(jpeg_bytes(size=(1600, 1200)), 100, 'JPEG', 85)
+        draft.assert_called_once_with(mock.ANY, 'RGB', (100, 100))
+        with Image.open(BytesIO(data)) as im:
+            self.assertEqual(im.size, (100, 75))
+
+    @override_settings(COURSE_IMAGES={'ASYNC': False, 'WEBP': True, 'SIZES': {'small': 50}, 'DEFAULT_SIZE': 'small'})
+    def test_img_url_follows_variant_key(self):
+        course = self.upload('Курс', jpeg_bytes())
+        course.refresh_from_db()
+
+        def img(**params):
+            return self.client.get('/school-api/courses/', params).json()['data'][0]['img']
+
+        base = 'http://testserver/media/'
+        self.assertEqual(img(), base + course.img_variants['small'])
+        self.assertEqual(img(img_format='webp'), base + course.img_variants['small.webp'])
+        # Неизвестный размер и original отдают исходный файл.
+        self.assertEqual(img(img_size='original'), base + course.img.name)
+        self.assertEqual(img(img_size='huge'), base + course.img.name)
+
+    def test_command_builds_missing_variants(self):
+        course = self.upload('Курс', jpeg_bytes())
+        Course.objects.filter(pk=course.pk).update(img_variants={})
+        out = StringIO()
+        call_command('build_course_images', stdout=out)
+        self.assertIn('Обработано курсов: 1', out.getvalue())
+        course.refresh_from_db()
+        self.assertEqual(list(course.img_variants), ['small'])
+        self.assertTrue(os.path.exists(os.path.join(self.media, course.img_variants['small'])))
+
+    def test_media_is_immutable_and_conditional(self):
+        course = self.upload('Курс', jpeg_bytes())
+        course.refresh_from_db()
+        url = self.client.get(f'/school-api/courses/?img_size=small').json()['data'][0]['img']
+        self.assertEqual(url, f'http://testserver/media/{course.img_variants["small"]}')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content)[:2], b'\xff\xd8')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_legacy_names_are_revalidated(self):
+        os.makedirs(os.path.join(self.media, 'courses'))
+        with open(os.path.join(self.media, 'courses', 'mpic_1234abcd.jpg'), 'wb') as f:
+            f.write(jpeg_bytes())
+        response = self.client.get('/media/courses/mpic_1234abcd.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        modified = self.client.get('/media/courses/mpic_1234abcd.jpg', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified.status_code, 304)
+        self.assertEqual(self.client.get('/media/../config/settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/courses/missing.jpg').status_code, 404)
+
+    def test_urls_are_cached_per_host(self):
+        make_course('Курс')
+        absolute_media_url.cache_clear()
+        self.client.get('/school-api/courses/')
+        self.client.get('/school-api/courses/', secure=True)
+        self.assertEqual(absolute_media_url.cache_info().currsize, 2)
+
+
+class CourseSearchTests(CatalogTestCase):
+    """Полнотекстовый поиск по курсам и урокам"""
+    url = '/school-api/courses/search/'
+
+    def setUp(self):
+        super().setUp()
+        self.python = make_course('Python для начинающих', description='Основы языка')
+        self.django = make_course('Django REST', description='API на Python')
+        self.design = make_course('Дизайн')
+        Lesson.objects.create(course=self.design, name='Макеты', text_content='Скрипты на python', hours=1)
+
+    def search(self, query, **params):
+        response = self.assertWithinQueryBudget('get', self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, query):
+        return [course['name'] for course in self.search(query)['data']]
+
+    def test_ranks_name_over_description_over_lessons(self):
+        self.assertEqual(self.names('python'), ['Python для начинающих', 'Django REST', 'Дизайн'])
+
+    def test_prefix_and_case_insensitive(self):
+        self.assertEqual(self.names('PYTH')[0], 'Python для начинающих')
+        self.assertEqual(self.names('ОСН'), ['Python для начинающих'])
+        self.assertEqual(self.names('djan re'), ['Django REST'])
+        self.assertEqual(self.names('скрипт'), ['Дизайн'])
+        self.assertEqual(self.names('"*) OR ('), [])
+
+    def test_index_follows_changes(self):
+        lesson = self.design.lessons.get()
+        lesson.course = self.django
+        lesson.text_content = 'Сериализаторы'
+        lesson.save()
+        self.assertEqual(self.names('сериализ'), ['Django REST'])
+        self.assertEqual(self.names('скрипт'), [])
+        self.python.name = 'Go'
+        self.python.save()
+        self.assertEqual(self.names('начинающих'), [])
+        self.django.delete()
+        self.assertEqual(self.names('сериализ'), [])
+        self.assertEqual(rebuild_index(), 2)
+        self.assertEqual([course.name for course in search_courses('go', 5)], ['Go'])
+
+    def test_sqlite_without_fts5_is_unsupported(self):
+        self.assertTrue(is_supported(connection))
+        with mock.patch('courses.search.has_fts5', return_value=False):
+            self.assertFalse(is_supported(connection))
+            make_course('Python 2')
+            with self.assertRaises(NotSupportedError):
+                search_courses('python', 5)
+            with self.assertRaises(CommandError):
+                call_command('rebuild_search_index', stdout=StringIO())
+        self.assertNotIn('Python 2', [course.name for course in search_courses('python', 5)])
+
+    def test_pagination_envelope_and_cache(self):
+        first = self.search('python', page_size=2)
+        self.assertEqual(len(first['data']), 2)
+        self.assertEqual(set(first['pagination']), set(self.client.get('/school-api/courses/').json()['pagination']))
+        self.assertIsNone(first['pagination']['total'])
+        self.assertEqual(first['pagination']['current'], 1)
+        self.assertEqual(self.search('python', page_size=2, with_total=1)['pagination']['total'], 2)
+        self.assertIsNone(first['pagination']['previous'])
+        second = self.client.get(first['pagination']['next']).json()
+        self.assertEqual([course['name'] for course in second['data']], ['Дизайн'])
+        self.assertIsNone(second['pagination']['next'])
+        response = self.client.get(self.url, {'q': 'python', 'page_size': 2})
+        self.assertEqual(response['X-Catalog-Cache'], 'hit')
+        self.assertEqual(self.client.get(self.url, {'q': 'python'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(self.url, {'q': 'python', 'page_size': 2},
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_empty_query_and_bad_page(self):
+        response = self.client.get(self.url, {'q': ' '})
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('q', response.json()['errors'])
+        self.assertEqual(self.client.get(self.url, {'q': 'python', 'page': 0}).status_code, 404)
+
+    def test_import_updates_index(self):
+        rows = [{'id': self.design.pk, 'name': 'Графика', 'description': '', 'hours': 5, 'price': '1000.00',
+                 'start_date': self.design.start_date.isoformat(), 'end_date': self.design.end_date.isoformat(),
+                 'img': self.design.img.name}]
+        import_rows('courses', rows, images=False)
+        self.assertEqual(self.names('граф'), ['Графика'])
+
+
+class EnrollmentStatusTests(CatalogTestCase):
+    """Статус записи студента в списке курсов (?with_status=1)"""
+    url = '/school-api/courses/'
+
+    def setUp(self):
+        super().setUp()
+        self.courses = [make_course(f'Курс {i}') for i in range(3)]
+
+    def statuses(self, **params):
+        response = self.assertWithinQueryBudget('get', self.url, {'with_status': 1, **params})
+        self.assertEqual(response.status_code, 200)
+        return [course['enrollment_status'] for course in response.json()['data']]
+
+    def queries(self, params):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, params)
+        return len(ctx)
+
+    def test_statuses_follow_buy_webhook_and_cancel(self):
+        self.assertNotIn('enrollment_status', self.client.get(self.url).json()['data'][0])
+        self.assertEqual(self.statuses(), [None, None, None])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{self.url}{self.courses[1].pk}/buy/')
+        self.assertEqual(self.statuses(), [None, 'pending', None])
+        enrollment = Enrollment.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/school-api/payment-webhook', {'order_id': enrollment.order_id, 'status': 'failed'})
+        self.assertEqual(self.statuses(), [None, 'failed', None])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/school-api/orders/{enrollment.pk}')
+        self.assertEqual(self.statuses(), [None, None, None])
+
+    def test_stale_map_does_not_outlive_invalidation(self):
+        self.assertEqual(self.statuses(), [None, None, None])
+        # Чтение началось до записи, а закончилось после сброса.
+        generation = catalog_cache.statuses_generation(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(user=self.user, course=self.courses[0], order_id='o1')
+        catalog_cache.set_statuses(self.user.pk, generation, {})
+        self.assertEqual(self.statuses(), ['pending', None, None])
+
+    def test_costs_as_much_as_plain_catalog(self):
+        Enrollment.objects.create(user=self.user, course=self.courses[0], order_id='o1', status='success')
+        self.statuses()
+        self.client.get(self.url)
+        self.assertEqual(self.queries({'with_status': 1}), self.queries({}))
+
+    def test_page_is_shared_and_etag_is_personal(self):
+        self.assertEqual(self.client.get(self.url, {'with_status': 1})['X-Catalog-Cache'], 'miss')
+        other = User.objects.create_user(username='other@mail.ru', email='other@mail.ru', password='Pass1_')
+        Enrollment.objects.create(user=other, course=self.courses[2], order_id='o2')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {Token.objects.create(user=other).key}')
+        response = client.get(self.url, {'with_status': 1})
+        self.assertEqual(response['X-Catalog-Cache'], 'hit')
+        self.assertEqual([c['enrollment_status'] for c in response.json()['data']], [None, None, 'pending'])
+
+        etag = self.client.get(self.url, {'with_status': 1})['ETag']
+        self.assertNotEqual(etag, response['ETag'])
+        self.assertEqual(self.client.get(self.url, {'with_status': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{self.url}{self.courses[0].pk}/buy/')
+        self.assertEqual(self.client.get(self.url, {'with_status': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_search_and_async_list(self):
+        Enrollment.objects.create(user=self.user, course=self.courses[0], order_id='o1')
+        response = self.client.get('/school-api/courses/search/', {'q': 'курс', 'with_status': 1})
+        self.assertEqual([c['enrollment_status'] for c in response.json()['data']], ['pending', None, None])
+        response = self.client.get('/school-api/async/courses', {'with_status': 1})
+        self.assertEqual([c['enrollment_status'] for c in response.json()['data']], ['pending', None, None])
+
+    def test_queued_webhook_and_reaper_invalidate(self):
+        enrollment = Enrollment.objects.create(user=self.user, course=self.courses[0], order_id='o1')
+        self.assertEqual(self.statuses()[0], 'pending')
+        with override_settings(PAYMENT_WEBHOOK={'MODE': 'queued'}):
+            self.client.post('/school-api/payment-webhook', {'order_id': 'o1', 'status': 'failed'})
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_payment_events', stdout=StringIO())
+        self.assertEqual(self.statuses()[0], 'failed')
+        Enrollment.objects.filter(pk=enrollment.pk).update(date=enrollment.date - datetime.timedelta(days=30))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reap_enrollments', stdout=StringIO())
+        self.assertEqual(self.statuses()[0], None)
+
+
+class CatalogCacheTests(CatalogTestCase):
+    """Бэкенды кеша каталога и его сброс сигналами"""
+
+    def check_round_trip(self, backend):
+        backend.set('catalog:a', b'1', 60)
+        backend.set('catalog:b', b'2', None)
+        self.assertEqual(backend.get('catalog:a'), b'1')
+        self.assertEqual(backend.incr('catalog:version'), 1)
+        self.assertEqual(backend.incr('catalog:version'), 2)
+        backend.delete('catalog:a')
+        self.assertIsNone(backend.get('catalog:a'))
+        self.assertEqual(backend.get('catalog:b'), b'2')
+        backend.clear()
+        self.assertIsNone(backend.get('catalog:b'))
+
+    def test_backends_round_trip(self):
+        self.check_round_trip(LocMemBackend())
+        with tempfile.TemporaryDirectory() as location:
+            self.check_round_trip(FileBackend(location))
+        self.check_round_trip(RedisBackend(client=InMemoryRedis()))
+
+    def test_expired_entries_are_dropped(self):
+        backend = LocMemBackend(max_entries=2)
+        backend.set('catalog:old', b'1', -1)
+        self.assertIsNone(backend.get('catalog:old'))
+        for key in 'abc':
+            backend.set(f'catalog:{key}', b'1', 60)
+        self.assertLessEqual(len(backend._data), 2)
+
+    def test_redis_clear_uses_key_prefix(self):
+        client = InMemoryRedis()
+        client.set('other:page', b'1')
+        config = {'BACKEND': 'api.cache.RedisBackend', 'KEY_PREFIX': 'school', 'OPTIONS': {'client': client}}
+        with override_settings(CATALOG_CACHE=config):
+            cache = CatalogCache()
+            cache.set_course(1, {'body': 1})
+            self.assertEqual(list(client.scan_iter('school:*')), ['school:course:1'])
+            cache.clear()
+            self.assertEqual(cache.get_course(1), None)
+            self.assertEqual(client.get('other:page'), b'1')
+
+    def test_signals_invalidate_entries(self):
+        course = make_course()
+        catalog_cache.set_course(course.pk, {'body': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(course=course, name='Урок', text_content='Текст', hours=1)
+        self.assertIsNone(catalog_cache.get_course(course.pk))
+
+        self.assertEqual(self.client.get('/school-api/courses/')['X-Catalog-Cache'], 'miss')
+        self.assertEqual(self.client.get('/school-api/courses/')['X-Catalog-Cache'], 'hit')
+        with self.captureOnCommitCallbacks(execute=True):
+            course.name = 'Новое название'
+            course.save()
+        response = self.client.get('/school-api/courses/')
+        self.assertEqual(response['X-Catalog-Cache'], 'miss')
+        self.assertEqual(response.json()['data'][0]['name'], 'Новое название')
@@ -1,67 +1,138 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
 from django.utils.html import format_html
 from django.urls import path, reverse
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from api.pagination import EstimatedCountPaginator
+from courses.models import Course
+from .certificates import certificate_registry
 from .models import Enrollment
-import random
 import requests 
 
 SERVICE_HOST = "http://test" 
 
-@admin.action(description='Распечатать сертификат')
-def print_certificate(modeladmin, request, queryset):
-    """Действие админ-панели для печати сертификата"""
-    
-    if queryset.count() != 1:
-        modeladmin.message_user(request, "Пожалуйста, выберите ровно одну запись для печати сертификата.", level='error')
-        return
-
-    enrollment = queryset.first()
-    
-    if enrollment.status != 'success':
-        modeladmin.message_user(request, "Сертификат можно распечатать только для оплаченных курсов.", level='error')
-        return
-
-    service_part = "123456"
-    random_part = "".join([str(random.randint(0, 9)) for _ in range(5)]) + "1"
-    
-    full_number = service_part + random_part
-    enrollment.certificate_number = full_number
-    enrollment.save()
-
-    
-    html_content = f"""
+CERTIFICATE_HEAD = """
     <html>
     <head>
         <title>Сертификат</title>
         <style>
-            body {{ font-family: sans-serif; text-align: center; border: 10px solid gold; padding: 50px; }}
-            h1 {{ color: navy; }}
-            .number {{ font-size: 20px; color: gray; }}
+            body { font-family: sans-serif; text-align: center; margin: 0; }
+            .certificate { border: 10px solid gold; padding: 50px; page-break-after: always; }
+            .certificate:last-child { page-break-after: auto; }
+            h1 { color: navy; }
+            .number { font-size: 20px; color: gray; }
         </style>
     </head>
     <body onload="window.print()">
-        <h1>Сертификат</h1>
-        <p>Настоящим подтверждается, что</p>
-        <h2>{enrollment.user.first_name} {enrollment.user.last_name} ({enrollment.user.email})</h2>
-        <p>Успешно прошел(ла) курс</p>
-        <h2>{enrollment.course.name}</h2>
-        <p class="number">Номер сертификата: {enrollment.certificate_number}</p>
+"""
+
+CERTIFICATE_PAGE = """
+        <div class="certificate">
+            <h1>Сертификат</h1>
+            <p>Настоящим подтверждается, что</p>
+            <h2>{} {} ({})</h2>
+            <p>Успешно прошел(ла) курс</p>
+            <h2>{}</h2>
+            <p class="number">Номер сертификата: {}</p>
+        </div>
+"""
+
+CERTIFICATE_TAIL = """
     </body>
     </html>
+"""
+
+
+def render_certificates(enrollments):
+    """Постранично отдает HTML-документ с сертификатами"""
+    yield CERTIFICATE_HEAD
+    for enrollment in enrollments:
+        yield format_html(
+            CERTIFICATE_PAGE,
+            enrollment.user.first_name, enrollment.user.last_name, enrollment.user.email,
+            enrollment.course.name, enrollment.certificate_number,
+        )
+    yield CERTIFICATE_TAIL
+
+
+@admin.action(description='Распечатать сертификаты')
+def print_certificate(modeladmin, request, queryset):
+    """Действие админ-панели для печати сертификатов по всем выбранным записям"""
+    paid = queryset.filter(status='success')
+    if not paid.exists():
+        modeladmin.message_user(request, "Сертификат можно распечатать только для оплаченных курсов.", level='error')
+        return
+
+    certificate_registry.issue_many(paid)
+
+    enrollments = (
+        paid.select_related('user', 'course')
+        .only('certificate_number', 'user__first_name', 'user__last_name', 'user__email', 'course__name')
+        .order_by('pk')
+        .iterator(chunk_size=200)
+    )
+    return StreamingHttpResponse(render_certificates(enrollments), content_type='text/html; charset=utf-8')
+
+class CourseFilter(admin.SimpleListFilter):
+    """Фильтр по курсу без загрузки всех курсов в боковую панель.
+
+    В панели показан только выбранный курс; выбрать курс можно по ссылке
+    из списка курсов (CourseAdmin.get_enrollments) или параметром ?course=<id>.
     """
-    return HttpResponse(html_content)
+    title = 'курс'
+    parameter_name = 'course'
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value or not value.isdigit():
+            return ()
+        return Course.objects.filter(pk=value).values_list('pk', 'name')
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(course_id=value)
+        return queryset
+
 
 class EnrollmentAdmin(admin.ModelAdmin):
-    """Административная панель для управления записями студентов"""
+    """Административная панель для управления записями студентов
+
+    Рассчитана на сотни тысяч записей: пользователь и курс выбираются одним
+    JOIN, число строк не считается целиком (EstimatedCountPaginator), поиск -
+    точное совпадение по индексированным email и order_id.
+    Число страниц - оценка: считается не дальше max_count строк после
+    открытой страницы, последние страницы открываются переходом вперед.
+    """
     list_display = ('get_user_email', 'get_user_name', 'course', 'date', 'status')
-    list_filter = ('course',)
+    list_filter = ('status', CourseFilter)
+    list_select_related = ('user', 'course')
+    search_fields = ('=user__email', '=order_id')
+    search_help_text = 'Точный email студента или ID заказа'
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('course',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = [print_certificate]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).only(
+            'date', 'status', 'order_id', 'certificate_number',
+            'user__email', 'user__first_name', 'user__last_name', 'course__name',
+        )
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            page_number = int(request.GET.get(PAGE_VAR, 1))
+        except ValueError:
+            page_number = 1
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, page_number=page_number)
+
     def get_user_email(self, obj):
         """Возвращает email пользователя."""
         return obj.user.email
     get_user_email.short_description = 'Email'
+    get_user_email.admin_order_field = 'user__email'
 
     def get_user_name(self, obj):
         """Возвращает полное имя пользователя."""
@@ -2,4 +2,4 @@ from django.apps import AppConfig
 
 class StudentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'students'
\ No newline at end of file
+    name = 'students'
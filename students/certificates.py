@@ -0,0 +1,205 @@
+"""Реестр сертификатов"""
+import hashlib
+import math
+import secrets
+import threading
+import time
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .models import Enrollment
+
+SERVICE_PART = '123456'
+BODY_MODULUS = 10 ** 9
+# Сколько раз выдача перевыпускает номер, совпавший с уже выданным.
+MAX_ATTEMPTS = 10
+NUMBER_LENGTH = len(SERVICE_PART) + 9 + 1
+LEGACY_NUMBER_LENGTH = 12
+
+DEFAULT_CERTIFICATE_REGISTRY = {
+    'TTL': 300,
+    'FALSE_POSITIVE_RATE': 0.001,
+}
+
+
+def luhn_digit(digits):
+    """Контрольная цифра по алгоритму Луна"""
+    total = 0
+    for i, char in enumerate(reversed(digits)):
+        value = int(char)
+        if i % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def generate_certificate_number():
+    """Случайный номер сертификата: служебная часть, тело и контрольная цифра.
+
+    Тело не связано с номером записи, поэтому номера нельзя перебрать;
+    совпадения с выданными отсекает уникальный индекс certificate_number.
+    """
+    body = secrets.randbelow(BODY_MODULUS)
+    payload = f'{SERVICE_PART}{body:09d}'
+    return payload + luhn_digit(payload)
+
+
+def is_well_formed(number):
+    """Проверка формата номера без обращения к БД"""
+    if not number.isdigit():
+        return False
+    if len(number) == NUMBER_LENGTH:
+        return number.startswith(SERVICE_PART) and luhn_digit(number[:-1]) == number[-1]
+    return len(number) == LEGACY_NUMBER_LENGTH
+
+
+class BloomFilter:
+    """Фильтр Блума для строк"""
+
+    def __init__(self, capacity, false_positive_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class CertificateRegistry:
+    """Проверка номеров сертификатов с отсевом заведомо неверных в памяти.
+
+    Фильтр Блума строится из БД и перестраивается раз в TTL, поэтому
+    номера, выданные другим процессом, становятся видны не позднее TTL.
+    Положительный ответ фильтра всегда подтверждается запросом к БД.
+    """
+
+    def __init__(self):
+        self._filter = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+        # Сколько потоков сейчас строят фильтр и номера, выданные за это время.
+        self._builders = 0
+        self._added = []
+
+    @property
+    def config(self):
+        return {**DEFAULT_CERTIFICATE_REGISTRY, **getattr(settings, 'CERTIFICATE_REGISTRY', {})}
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+
+    def _build(self):
+        numbers = Enrollment.objects.exclude(certificate_number=None)
+        bloom = BloomFilter(numbers.count() * 2 + 1000, self.config['FALSE_POSITIVE_RATE'])
+        for number in numbers.values_list('certificate_number', flat=True).iterator():
+            bloom.add(number)
+        return bloom
+
+    def _get_filter(self):
+        """Текущий фильтр; устаревший перестраивается без удержания блокировки.
+
+        Пока один поток читает номера из БД, остальные проверяют по старому
+        фильтру. Номера, выданные во время перестройки, добавляются в новый
+        фильтр перед заменой.
+        """
+        with self._lock:
+            expired = time.monotonic() - self._built_at > self.config['TTL']
+            if self._filter is not None and (not expired or self._builders):
+                return self._filter
+            self._builders += 1
+        started = time.monotonic()
+        bloom = None
+        try:
+            bloom = self._build()
+        finally:
+            with self._lock:
+                self._builders -= 1
+                if bloom is not None:
+                    for number in self._added:
+                        bloom.add(number)
+                    self._filter, self._built_at = bloom, started
+                if not self._builders:
+                    self._added = []
+        return bloom
+
+    def add(self, number):
+        """Добавляет выданный номер в фильтр"""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(number)
+            if self._builders:
+                self._added.append(number)
+
+    def might_contain(self, number):
+        return is_well_formed(number) and number in self._get_filter()
+
+    def verify(self, number):
+        """Существует ли сертификат с таким номером"""
+        if not self.might_contain(number):
+            return False
+        return Enrollment.objects.filter(certificate_number=number).exists()
+
+    def issue(self, enrollment):
+        """Выдает сертификат записи (повторно возвращает уже выданный номер)"""
+        for attempt in range(MAX_ATTEMPTS):
+            if enrollment.certificate_number:
+                break
+            enrollment.certificate_number = generate_certificate_number()
+            try:
+                with transaction.atomic():
+                    enrollment.save(update_fields=['certificate_number'])
+            except IntegrityError:
+                enrollment.certificate_number = None
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+        self.add(enrollment.certificate_number)
+        return enrollment.certificate_number
+
+    def issue_many(self, queryset, batch_size=500):
+        """Выдает сертификаты всем записям выборки без номера одним bulk_update"""
+        pks = list(queryset.filter(certificate_number=None).values_list('pk', flat=True))
+        for attempt in range(MAX_ATTEMPTS):
+            pending = [Enrollment(pk=pk) for pk in pks]
+            numbers = self._unused_numbers(len(pending), batch_size)
+            for enrollment, number in zip(pending, numbers):
+                enrollment.certificate_number = number
+            try:
+                with transaction.atomic():
+                    Enrollment.objects.bulk_update(pending, ['certificate_number'], batch_size=batch_size)
+                break
+            except IntegrityError:
+                # Номер успел выдать другой процесс: пачка откатывается целиком.
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+        for enrollment in pending:
+            self.add(enrollment.certificate_number)
+        return len(pending)
+
+    def _unused_numbers(self, count, batch_size):
+        """count различных случайных номеров, которых еще нет в БД"""
+        numbers = set()
+        while len(numbers) < count:
+            candidates = {
+                generate_certificate_number() for _ in range(min(count - len(numbers), batch_size))
+            } - numbers
+            taken = Enrollment.objects.filter(certificate_number__in=candidates).values_list(
+                'certificate_number', flat=True,
+            )
+            numbers |= candidates - set(taken)
+        return list(numbers)
+
+
+certificate_registry = CertificateRegistry()
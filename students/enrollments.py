@@ -0,0 +1,37 @@
+"""Запись студентов на курсы"""
+import uuid
+from django.db import connections, router
+from django.utils import timezone
+from .models import Enrollment
+from .signals import enrollments_changed
+
+
+def enroll(user, course, order_id=None):
+    """Создает неоплаченную запись или выдает новый order_id существующей.
+
+    Выполняется одним INSERT ... ON CONFLICT по уникальной паре
+    (user, course), поэтому параллельные покупки не создают дубликатов.
+    Дата неоплаченной записи - время последней попытки оплаты: по ней
+    брошенные записи находит очистка (students.reaper).
+    Возвращает order_id или None, если курс уже оплачен.
+    """
+    order_id = order_id or uuid.uuid4().hex
+    connection = connections[router.db_for_write(Enrollment)]
+    table = connection.ops.quote_name(Enrollment._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} (user_id, course_id, date, status, order_id) '
+        f"VALUES (%s, %s, %s, 'pending', %s) "
+        f'ON CONFLICT (user_id, course_id) DO UPDATE SET order_id = excluded.order_id, date = excluded.date '
+        f"WHERE {table}.status <> 'success' "
+        f'RETURNING order_id'
+    )
+    with connection.cursor() as cursor:
+        # Дата в том же формате, что пишет ORM (на SQLite - наивное время
+        # в UTC): иначе строки сравниваются с датами записей ORM неверно.
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        cursor.execute(sql, [user.pk, course.pk, now, order_id])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    enrollments_changed.send(Enrollment, user_ids=[user.pk])
+    return row[0]
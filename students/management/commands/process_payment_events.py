@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from students.models import PaymentEvent
+from students.payments import drain_payment_events
+
+
+class Command(BaseCommand):
+    """Обработка очереди событий платежного вебхука"""
+    help = 'Применяет накопленные события оплаты пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Размер пачки')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно')
+        parser.add_argument('--interval', type=float, default=1.0, help='Пауза между проходами, с')
+        parser.add_argument(
+            '--purge-days', type=int, default=None,
+            help='Удалять обработанные события старше указанного числа дней',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = drain_payment_events(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Обработано событий: {processed}')
+            if options['purge_days'] is not None:
+                border = timezone.now() - timedelta(days=options['purge_days'])
+                PaymentEvent.objects.filter(processed_at__lt=border).delete()
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from students.reaper import ReaperThread, get_config, reap_enrollments
+
+
+class Command(BaseCommand):
+    """Очистка брошенных неоплаченных записей"""
+    help = 'Удаляет или архивирует неоплаченные записи старше заданного возраста пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=None, help='Возраст записи, дней')
+        parser.add_argument('--batch-size', type=int, default=None, help='Размер пачки')
+        parser.add_argument('--no-archive', action='store_true', help='Удалять без переноса в архив')
+        parser.add_argument('--loop', action='store_true', help='Не завершаться, повторяя очистку каждые --interval секунд')
+        parser.add_argument('--interval', type=float, default=None, help='Период для --loop, с (по умолчанию INTERVAL)')
+
+    def handle(self, *args, **options):
+        config = get_config()
+        reap_options = {
+            'max_age_days': options['days'],
+            'BATCH_SIZE': options['batch_size'] or config['BATCH_SIZE'],
+            'ARCHIVE': config['ARCHIVE'] and not options['no_archive'],
+        }
+        if not options['loop']:
+            reaped = reap_enrollments(**reap_options)
+            self.stdout.write(f'Удалено записей: {reaped}')
+            return
+        interval = options['interval'] or config['INTERVAL']
+        if not interval:
+            raise CommandError('Для --loop задайте --interval или ENROLLMENT_REAPER["INTERVAL"]')
+        self.stdout.write(f'Очистка каждые {interval} с')
+        try:
+            ReaperThread(interval, **reap_options).run()
+        except KeyboardInterrupt:
+            pass
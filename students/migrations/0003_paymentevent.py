@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=100, verbose_name='ID заказа')),
+                ('status', models.CharField(max_length=10, verbose_name='Статус оплаты')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Обработано')),
+            ],
+        ),
+    ]
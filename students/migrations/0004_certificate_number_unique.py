@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+import secrets
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def luhn_digit(digits):
+    total = 0
+    for i, char in enumerate(reversed(digits)):
+        value = int(char)
+        if i % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def reissue_duplicate_numbers(apps, schema_editor):
+    """Случайные номера старого формата могли совпадать: дубликаты перевыпускаются"""
+    Enrollment = apps.get_model('students', 'Enrollment')
+    db_alias = schema_editor.connection.alias
+    enrollments = Enrollment.objects.using(db_alias)
+    duplicates = (
+        enrollments.exclude(certificate_number=None)
+        .values('certificate_number').annotate(n=Count('pk')).filter(n__gt=1)
+        .values_list('certificate_number', flat=True)
+    )
+    for number in list(duplicates):
+        for enrollment in enrollments.filter(certificate_number=number).order_by('pk')[1:]:
+            while True:
+                payload = f'123456{secrets.randbelow(10 ** 9):09d}'
+                enrollment.certificate_number = payload + luhn_digit(payload)
+                if not enrollments.filter(certificate_number=enrollment.certificate_number).exists():
+                    break
+            enrollment.save(update_fields=['certificate_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='enrollment',
+            name='certificate_number',
+            field=models.CharField(blank=True, max_length=16, null=True, verbose_name='Номер сертификата'),
+        ),
+        migrations.RunPython(reissue_duplicate_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='enrollment',
+            name='certificate_number',
+            field=models.CharField(blank=True, max_length=16, null=True, unique=True, verbose_name='Номер сертификата'),
+        ),
+    ]
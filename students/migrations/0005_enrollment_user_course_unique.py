@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Value, When
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    """Из дубликатов записи на курс остается оплаченная, иначе самая новая"""
+    Enrollment = apps.get_model('students', 'Enrollment')
+    duplicates = (
+        Enrollment.objects.values('user_id', 'course_id')
+        .annotate(n=Count('pk')).filter(n__gt=1)
+        .values_list('user_id', 'course_id')
+    )
+    for user_id, course_id in list(duplicates):
+        rows = (
+            Enrollment.objects.filter(user_id=user_id, course_id=course_id)
+            .annotate(paid=Case(When(status='success', then=Value(1)), default=Value(0), output_field=IntegerField()))
+            .order_by('-paid', '-pk')
+            .values_list('pk', flat=True)
+        )
+        Enrollment.objects.filter(pk__in=list(rows)[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_catalog_version'),
+        ('students', '0004_certificate_number_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_enrollment_user_course'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_enrollment_user_course_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='enrollment',
+            name='order_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='ID заказа'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_search'),
+        ('students', '0006_enrollment_order_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEnrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrollment_id', models.BigIntegerField(verbose_name='ID записи')),
+                ('date', models.DateTimeField(verbose_name='Дата записи')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает оплаты'), ('success', 'Оплачено'), ('failed', 'Ошибка оплаты')], max_length=10, verbose_name='Статус оплаты')),
+                ('order_id', models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='ID заказа')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Архивирована')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['status', 'date'], name='enrollment_status_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedenrollment',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='archivedenrollment',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -2,6 +2,14 @@ from django.db import models
 from django.conf import settings
 from courses.models import Course
 
+class EnrollmentQuerySet(models.QuerySet):
+    """Выборки записей на курсы"""
+
+    def for_listing(self):
+        """Записи вместе с курсом одним запросом (без N+1)"""
+        return self.select_related('course').order_by('pk')
+
+
 class Enrollment(models.Model):
     """Модель записи студента на курс"""
     STATUS_CHOICES = (
@@ -14,9 +22,45 @@ class Enrollment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
     date = models.DateTimeField(auto_now_add=True, verbose_name="Дата записи")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус оплаты")
-    order_id = models.CharField(max_length=100, blank=True, null=True, verbose_name="ID заказа")
-    certificate_number = models.CharField(max_length=12, blank=True, null=True, verbose_name="Номер сертификата")
+    order_id = models.CharField(max_length=100, blank=True, null=True, db_index=True, verbose_name="ID заказа")
+    certificate_number = models.CharField(max_length=16, blank=True, null=True, unique=True, verbose_name="Номер сертификата")
+
+    objects = EnrollmentQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_enrollment_user_course'),
+        ]
+        indexes = [
+            # Поиск брошенных записей (students.reaper)
+            models.Index(fields=['status', 'date'], name='enrollment_status_date_idx'),
+        ]
 
     def __str__(self):
         """Возвращает строковое представление записи (email студента - название курса)."""
-        return f"{self.user.email} - {self.course.name}"
\ No newline at end of file
+        return f"{self.user.email} - {self.course.name}"
+
+class ArchivedEnrollment(models.Model):
+    """Неоплаченная запись, убранная очисткой (students.reaper)"""
+    enrollment_id = models.BigIntegerField(verbose_name="ID записи")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    date = models.DateTimeField(verbose_name="Дата записи")
+    status = models.CharField(max_length=10, choices=Enrollment.STATUS_CHOICES, verbose_name="Статус оплаты")
+    order_id = models.CharField(max_length=100, blank=True, null=True, db_index=True, verbose_name="ID заказа")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Архивирована")
+
+    def __str__(self):
+        """Возвращает строковое представление (заказ - статус)."""
+        return f"{self.order_id} - {self.status}"
+
+class PaymentEvent(models.Model):
+    """Событие платежного вебхука в очереди на обработку"""
+    order_id = models.CharField(max_length=100, verbose_name="ID заказа")
+    status = models.CharField(max_length=10, verbose_name="Статус оплаты")
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Получено")
+    processed_at = models.DateTimeField(blank=True, null=True, db_index=True, verbose_name="Обработано")
+
+    def __str__(self):
+        """Возвращает строковое представление события (заказ - статус)."""
+        return f"{self.order_id} - {self.status}"
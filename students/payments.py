@@ -0,0 +1,111 @@
+"""Обработка статусов оплаты"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections, router, transaction
+from django.utils import timezone
+from .models import Enrollment, PaymentEvent
+from .signals import enrollments_changed
+
+PAYMENT_STATUSES = ('success', 'failed')
+
+
+def next_status(current, incoming):
+    """Статус записи после события оплаты: успешная оплата не откатывается"""
+    if current == 'success' or incoming not in PAYMENT_STATUSES:
+        return current
+    return incoming
+
+
+def apply_payment_status(order_id, status):
+    """Синхронное применение статуса одним UPDATE ... RETURNING.
+
+    RETURNING отдает студентов измененных записей для сброса их статусов
+    в кеше (api.statuses) без отдельного запроса.
+    """
+    if status not in PAYMENT_STATUSES:
+        return 0
+    connection = connections[router.db_for_write(Enrollment)]
+    table = connection.ops.quote_name(Enrollment._meta.db_table)
+    sql = (
+        f'UPDATE {table} SET status = %s '
+        f"WHERE order_id = %s AND status <> 'success' "
+        f'RETURNING user_id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [status, order_id])
+        user_ids = [row[0] for row in cursor.fetchall()]
+    if user_ids:
+        enrollments_changed.send(Enrollment, user_ids=user_ids)
+    return len(user_ids)
+
+
+def enqueue_payment_event(order_id, status):
+    """Сохраняет событие в очередь для пакетной обработки"""
+    return PaymentEvent.objects.create(order_id=order_id, status=status)
+
+
+def handle_payment_webhook(order_id, status):
+    """Обработка вебхука в режиме из настроек PAYMENT_WEBHOOK"""
+    if not order_id or status not in PAYMENT_STATUSES:
+        return
+    if settings.PAYMENT_WEBHOOK.get('MODE') == 'queued':
+        enqueue_payment_event(order_id, status)
+    else:
+        apply_payment_status(order_id, status)
+
+
+async def ahandle_payment_webhook(order_id, status):
+    """Асинхронный вариант handle_payment_webhook"""
+    if not order_id or status not in PAYMENT_STATUSES:
+        return
+    if settings.PAYMENT_WEBHOOK.get('MODE') == 'queued':
+        await PaymentEvent.objects.acreate(order_id=order_id, status=status)
+    else:
+        # aupdate() не возвращает измененные строки, а UPDATE ... RETURNING
+        # дает студентов для сброса кеша тем же запросом; сырой SQL в async
+        # ORM не поддерживается, поэтому он выполняется в потоке ORM.
+        await sync_to_async(apply_payment_status)(order_id, status)
+
+
+def process_payment_events(batch_size=None):
+    """Применяет одну пачку событий из очереди, возвращает число событий.
+
+    Повторные события одного заказа схлопываются, изменившиеся записи
+    сохраняются одним bulk_update.
+    """
+    batch_size = batch_size or settings.PAYMENT_WEBHOOK.get('BATCH_SIZE', 500)
+    with transaction.atomic():
+        events = PaymentEvent.objects.filter(processed_at__isnull=True).order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            events = events.select_for_update(skip_locked=True)
+        events = list(events.values_list('pk', 'order_id', 'status')[:batch_size])
+        if not events:
+            return 0
+
+        statuses = {}
+        for _, order_id, status in events:
+            statuses.setdefault(order_id, []).append(status)
+
+        changed = []
+        enrollments = Enrollment.objects.filter(order_id__in=list(statuses)).only('pk', 'user_id', 'order_id', 'status')
+        for enrollment in enrollments:
+            status = enrollment.status
+            for incoming in statuses[enrollment.order_id]:
+                status = next_status(status, incoming)
+            if status != enrollment.status:
+                enrollment.status = status
+                changed.append(enrollment)
+
+        Enrollment.objects.bulk_update(changed, ['status'], batch_size=batch_size)
+        if changed:
+            enrollments_changed.send(Enrollment, user_ids=[enrollment.user_id for enrollment in changed])
+        PaymentEvent.objects.filter(pk__in=[pk for pk, _, _ in events]).update(processed_at=timezone.now())
+    return len(events)
+
+
+def drain_payment_events(batch_size=None):
+    """Обрабатывает очередь до конца, возвращает число событий"""
+    total = 0
+    while processed := process_payment_events(batch_size):
+        total += processed
+    return total
@@ -0,0 +1,144 @@
+"""Очистка брошенных неоплаченных записей.
+
+Записи в статусах ENROLLMENT_REAPER['STATUSES'], у которых последняя
+попытка оплаты (Enrollment.date) старше MAX_AGE_DAYS, удаляются или
+переносятся в ArchivedEnrollment. Работа идет пачками по BATCH_SIZE,
+каждая пачка - отдельная короткая транзакция, между пачками пауза PAUSE:
+блокировка записи SQLite не удерживается долго, и buy и вебхук оплаты
+не ждут окончания всей очистки.
+
+Запускается командой ``manage.py reap_enrollments`` (по cron) или ею же
+как отдельный процесс: ``manage.py reap_enrollments --loop`` повторяет
+очистку каждые INTERVAL секунд. Веб-процессы очистку сами не запускают,
+иначе каждый воркер чистил бы одни и те же записи.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, router, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import ArchivedEnrollment, Enrollment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENROLLMENT_REAPER = {
+    'MAX_AGE_DAYS': 7,
+    'STATUSES': ('pending', 'failed'),
+    'ARCHIVE': True,
+    'BATCH_SIZE': 500,
+    # Пауза между пачками, с
+    'PAUSE': 0.05,
+    # Период очистки для reap_enrollments --loop и start_reaper(), с
+    'INTERVAL': None,
+}
+
+ARCHIVE_FIELDS = ('pk', 'user_id', 'course_id', 'date', 'status', 'order_id')
+
+
+def get_config():
+    return {**DEFAULT_ENROLLMENT_REAPER, **getattr(settings, 'ENROLLMENT_REAPER', {})}
+
+
+def abandoned_enrollments(cutoff, statuses):
+    return Enrollment.objects.filter(status__in=statuses, date__lt=cutoff)
+
+
+def reap_batch(cutoff, config):
+    """Удаляет (архивирует) одну пачку, возвращает удаленные строки"""
+    using = router.db_for_write(Enrollment)
+    with transaction.atomic(using=using):
+        queryset = abandoned_enrollments(cutoff, config['STATUSES']).using(using).order_by('pk')
+        if connections[using].features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        rows = list(queryset.values_list(*ARCHIVE_FIELDS)[:config['BATCH_SIZE']])
+        if not rows:
+            return []
+        if config['ARCHIVE']:
+            ArchivedEnrollment.objects.using(using).bulk_create(
+                ArchivedEnrollment(
+                    enrollment_id=pk, user_id=user_id, course_id=course_id, date=date, status=status,
+                    order_id=order_id,
+                )
+                for pk, user_id, course_id, date, status, order_id in rows
+            )
+        Enrollment.objects.using(using).filter(pk__in=[row[0] for row in rows]).delete()
+    return rows
+
+
+def reap_enrollments(max_age_days=None, now=None, **options):
+    """Очищает все брошенные записи пачками, возвращает их число"""
+    config = {**get_config(), **options}
+    if max_age_days is None:
+        max_age_days = config['MAX_AGE_DAYS']
+    cutoff = (now or timezone.now()) - timedelta(days=max_age_days)
+    total = 0
+    while rows := reap_batch(cutoff, config):
+        total += len(rows)
+        if len(rows) < config['BATCH_SIZE']:
+            break
+        time.sleep(config['PAUSE'])
+    return total
+
+
+class ReaperThread(threading.Thread):
+    """Фоновый поток, запускающий очистку раз в INTERVAL секунд"""
+
+    def __init__(self, interval, **options):
+        super().__init__(name='enrollment-reaper', daemon=True)
+        self.interval = interval
+        self.options = options
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                reaped = reap_enrollments(**self.options)
+                if reaped:
+                    logger.info('Удалено брошенных записей: %s', reaped)
+            except Exception:
+                logger.exception('Очистка брошенных записей не удалась')
+            finally:
+                # Между проходами соединения потока не нужны.
+                connections.close_all()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_thread = None
+_lock = threading.Lock()
+
+
+def start_reaper():
+    """Запускает фоновый поток в текущем процессе, если задан INTERVAL.
+
+    Повторный вызов ничего не делает. Приложение поток не запускает: это
+    делает только тот, кто вызвал функцию явно.
+    """
+    global _thread
+    interval = get_config()['INTERVAL']
+    if not interval:
+        return None
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = ReaperThread(interval)
+            _thread.start()
+    return _thread
+
+
+def stop_reaper():
+    global _thread
+    with _lock:
+        if _thread is not None:
+            _thread.stop()
+            _thread = None
+
+
+@receiver(setting_changed)
+def reset_reaper(setting, **kwargs):
+    if setting == 'ENROLLMENT_REAPER':
+        stop_reaper()
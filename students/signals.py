@@ -0,0 +1,6 @@
+"""Сигналы записей на курсы"""
+from django.dispatch import Signal
+
+# Записи студентов user_ids изменены в обход save()/delete():
+# upsert при покупке, UPDATE вебхука, пакетная обработка и очистка.
+enrollments_changed = Signal()
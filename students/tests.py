@@ -1 +1,718 @@
-from django.test import TestCase
\ No newline at end of file
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models.query import RawQuerySet
+from django.http import StreamingHttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, URLPattern, URLResolver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from api.testing import QueryBudgetTestCase
+from rest_framework.renderers import JSONRenderer
+from api.fast_serializers import FastCourseSerializer, FastEnrollmentSerializer, FastLessonSerializer
+from api.cache import CatalogCache, catalog_cache
+from api.pagination import EstimatedCountPaginator
+from api.routing import sticky_users
+from api.serializers import CourseSerializer, EnrollmentSerializer, LessonSerializer
+from api.streaming import stream_json_list
+from api.views import EnrollmentViewSet
+from courses.models import Course, Lesson
+from courses.search import search_courses
+from users.models import User
+from .admin import EnrollmentAdmin
+from .models import ArchivedEnrollment, Enrollment, PaymentEvent
+from .enrollments import enroll
+from .certificates import CertificateRegistry, certificate_registry, generate_certificate_number, is_well_formed
+from .payments import drain_payment_events
+from .reaper import reap_enrollments, start_reaper, stop_reaper
+
+
+def make_course(name='Курс', **kwargs):
+    """Создает курс с валидными значениями по умолчанию"""
+    defaults = {
+        'hours': 5,
+        'price': 1000,
+        'start_date': datetime.date.today() + datetime.timedelta(days=10),
+        'end_date': datetime.date.today() + datetime.timedelta(days=40),
+        'img': 'courses/mpic_test.jpg',
+    }
+    defaults.update(kwargs)
+    return Course.objects.create(name=name, **defaults)
+
+
+class OrdersQueryBudgetTests(QueryBudgetTestCase):
+    """Количество запросов для списка заказов не зависит от числа записей"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.key}')
+
+    def enroll(self, count):
+        for i in range(count):
+            Enrollment.objects.create(user=self.user, course=make_course(f'Курс {i}'), order_id=f'o{i}')
+
+    def test_orders_constant_queries(self):
+        self.enroll(1)
+        self.client.get('/school-api/orders')
+        with CaptureQueriesContext(connection) as one:
+            self.client.get('/school-api/orders')
+        self.enroll(20)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/school-api/orders')
+        self.assertEqual(len(one), len(many))
+        self.assertEqual(len(response.json()['data']), 21)
+
+    def test_orders_within_budget(self):
+        self.enroll(10)
+        response = self.assertWithinQueryBudget('get', '/school-api/orders')
+        self.assertEqual(response.status_code, 200)
+        item = response.json()['data'][0]
+        self.assertEqual(item['payment_status'], 'pending')
+        self.assertEqual(item['course']['img'], 'http://testserver/media/courses/mpic_test.jpg')
+
+    def test_enrollment_viewset_constant_queries(self):
+        self.enroll(15)
+        view = EnrollmentViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = view(request)
+        self.assertEqual(len(response.data['data']), 15)
+        self.assertLessEqual(len(ctx), EnrollmentViewSet.query_budget['list'])
+
+    def test_catalog_within_budget(self):
+        course = make_course()
+        self.assertWithinQueryBudget('get', '/school-api/courses/')
+        self.assertWithinQueryBudget('get', f'/school-api/courses/{course.pk}/')
+
+    def test_cancel_within_budget(self):
+        self.enroll(1)
+        enrollment = Enrollment.objects.get()
+        response = self.assertWithinQueryBudget('get', f'/school-api/orders/{enrollment.pk}')
+        self.assertEqual(response.json(), {'status': 'success'})
+
+    def test_every_endpoint_declares_budget(self):
+        def walk(patterns, prefix):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from walk(pattern.url_patterns, prefix + str(pattern.pattern))
+                elif isinstance(pattern, URLPattern):
+                    yield prefix + str(pattern.pattern), pattern.callback
+
+        for route, callback in walk(get_resolver().url_patterns, '/'):
+            if not route.startswith('/school-api/'):
+                continue
+            view_class = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+            if view_class is None:
+                continue
+            if view_class.__name__ == 'APIRootView':
+                continue
+            self.assertIsNotNone(getattr(view_class, 'query_budget', None), route)
+
+
+@override_settings(PAYMENT_WEBHOOK={'MODE': 'queued', 'BATCH_SIZE': 2})
+class QueuedPaymentWebhookTests(QueryBudgetTestCase):
+    """Очередь вебхука: дедупликация и идемпотентные переходы"""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.paid = Enrollment.objects.create(user=user, course=make_course('A'), order_id='a')
+        self.pending = Enrollment.objects.create(user=user, course=make_course('B'), order_id='b')
+
+    def post(self, order_id, status):
+        return self.assertWithinQueryBudget(
+            'post', '/school-api/payment-webhook', {'order_id': order_id, 'status': status}, format='json'
+        )
+
+    def test_events_are_queued_and_applied_in_batches(self):
+        for order_id, status in [('a', 'success'), ('a', 'success'), ('a', 'failed'),
+                                 ('b', 'failed'), ('b', 'failed'), ('x', 'success')]:
+            self.assertEqual(self.post(order_id, status).status_code, 204)
+        self.assertEqual(Enrollment.objects.get(pk=self.paid.pk).status, 'pending')
+
+        self.assertEqual(drain_payment_events(), 6)
+        self.paid.refresh_from_db()
+        self.pending.refresh_from_db()
+        self.assertEqual(self.paid.status, 'success')
+        self.assertEqual(self.pending.status, 'failed')
+        self.assertFalse(PaymentEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(drain_payment_events(), 0)
+
+    def test_unknown_status_is_not_queued(self):
+        self.post('a', 'refunded')
+        self.assertFalse(PaymentEvent.objects.exists())
+
+
+class CertificateRegistryTests(QueryBudgetTestCase):
+    """Проверка сертификатов отсеивает неверные номера без запросов к БД"""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.enrollment = Enrollment.objects.create(user=user, course=make_course(), status='success')
+        self.number = certificate_registry.issue(self.enrollment)
+
+    def check(self, number):
+        return self.client.post('/school-api/check-sertificate', {'sertikate_number': number}, format='json')
+
+    def test_numbers_are_random_and_well_formed(self):
+        numbers = {generate_certificate_number() for _ in range(1000)}
+        self.assertGreater(len(numbers), 990)
+        self.assertTrue(all(is_well_formed(n) for n in numbers))
+
+    def test_colliding_number_is_reissued(self):
+        other = Enrollment.objects.create(user=self.enrollment.user, course=make_course(), status='success')
+        fresh = generate_certificate_number()
+        with mock.patch('students.certificates.generate_certificate_number', side_effect=[self.number, fresh]):
+            self.assertEqual(certificate_registry.issue(other), fresh)
+        other.refresh_from_db()
+        self.assertEqual(other.certificate_number, fresh)
+
+    def test_issue_many_skips_taken_numbers(self):
+        user = self.enrollment.user
+        enrollments = [Enrollment.objects.create(user=user, course=make_course()) for _ in range(3)]
+        fresh = [generate_certificate_number() for _ in range(3)]
+        with mock.patch('students.certificates.generate_certificate_number',
+                        side_effect=[self.number, *fresh]):
+            self.assertEqual(certificate_registry.issue_many(Enrollment.objects.all()), 3)
+        issued = Enrollment.objects.filter(pk__in=[e.pk for e in enrollments])
+        self.assertEqual(set(issued.values_list('certificate_number', flat=True)), set(fresh))
+
+    def test_issued_number_is_verified(self):
+        self.check(generate_certificate_number())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.check(self.number)
+        self.assertEqual(response.json(), {'status': 'success'})
+        self.assertEqual(len(ctx), 1)
+
+    def test_filter_is_rebuilt_outside_lock(self):
+        registry = CertificateRegistry()
+        old = registry._get_filter()
+        late = generate_certificate_number()
+        build = registry._build
+
+        def slow_build():
+            # Пока фильтр строится, проверки идут по старому без ожидания.
+            self.assertIs(registry._get_filter(), old)
+            registry.add(late)
+            return build()
+
+        with override_settings(CERTIFICATE_REGISTRY={'TTL': -1}), \
+                mock.patch.object(registry, '_build', side_effect=slow_build):
+            bloom = registry._get_filter()
+        self.assertIsNot(bloom, old)
+        self.assertIn(self.number, bloom)
+        self.assertIn(late, bloom)
+
+    def test_invalid_numbers_skip_database(self):
+        self.check(generate_certificate_number())
+        unissued = generate_certificate_number()
+        bad_check_digit = self.number[:-1] + str((int(self.number[-1]) + 1) % 10)
+        for number in ['123456000000001', unissued, bad_check_digit, 'abc']:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.check(number)
+            self.assertEqual(response.json(), {'status': 'failed'})
+            self.assertEqual(len(ctx), 0, number)
+
+
+class BuyCourseTests(QueryBudgetTestCase):
+    """Покупка курса одним upsert-запросом"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.key}')
+        self.course = make_course()
+        self.url = f'/school-api/courses/{self.course.pk}/buy/'
+
+    def test_repeated_buy_rotates_order_id(self):
+        first = self.assertWithinQueryBudget('post', self.url).json()['pay_url']
+        second = self.assertWithinQueryBudget('post', self.url).json()['pay_url']
+        self.assertNotEqual(first, second)
+        enrollment = Enrollment.objects.get(user=self.user, course=self.course)
+        self.assertEqual(enrollment.status, 'pending')
+        self.assertTrue(second.endswith(enrollment.order_id))
+
+    def test_started_course_is_unavailable(self):
+        today = datetime.date.today()
+        for start in (today, today - datetime.timedelta(days=1)):
+            Course.objects.filter(pk=self.course.pk).update(start_date=start)
+            response = self.assertWithinQueryBudget('post', self.url)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'message': 'Course unavailable'})
+        self.assertFalse(Course.objects.available(today).filter(pk=self.course.pk).exists())
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_date_is_stored_like_orm_writes(self):
+        self.assertWithinQueryBudget('post', self.url)
+        other = Enrollment.objects.create(user=self.user, course=make_course('Другой'), order_id='o2')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT course_id, CAST(date AS TEXT) FROM students_enrollment')
+            stored = dict(cursor.fetchall())
+        pattern = r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(\.\d{6})?$'
+        self.assertRegex(stored[other.course_id], pattern)
+        self.assertRegex(stored[self.course.pk], pattern)
+        self.assertEqual(
+            list(Enrollment.objects.filter(date__lt=other.date).values_list('course_id', flat=True)), [self.course.pk],
+        )
+
+    def test_paid_course_is_not_reordered(self):
+        Enrollment.objects.create(user=self.user, course=self.course, order_id='o1', status='success')
+        response = self.assertWithinQueryBudget('post', self.url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(enroll(self.user, self.course))
+        self.assertEqual(Enrollment.objects.get().order_id, 'o1')
+
+    def test_failed_order_gets_new_order_id(self):
+        Enrollment.objects.create(user=self.user, course=self.course, order_id='o1', status='failed')
+        order_id = enroll(self.user, self.course)
+        self.assertEqual(Enrollment.objects.get().order_id, order_id)
+
+
+class ConcurrentBuyTests(TransactionTestCase):
+    """Параллельные покупки одного курса создают одну запись"""
+
+    def test_parallel_buys_create_single_enrollment(self):
+        user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        token = Token.objects.create(user=user)
+        course = make_course()
+        barrier = threading.Barrier(8)
+        statuses = []
+
+        def buy():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.key}')
+            try:
+                barrier.wait()
+                statuses.append(client.post(f'/school-api/courses/{course.pk}/buy/').status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [200] * 8)
+        self.assertEqual(Enrollment.objects.filter(user=user, course=course).count(), 1)
+
+
+class StreamingListTests(QueryBudgetTestCase):
+    """Потоковая отдача списков совпадает с обычной"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.key}')
+        for i in range(12):
+            Enrollment.objects.create(user=self.user, course=make_course(f'Курс «{i}»'), order_id=f'o{i}')
+
+    def test_orders_stream_matches_response(self):
+        expected = self.client.get('/school-api/orders').content
+        response = self.client.get('/school-api/orders?stream=1')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(b''.join(response.streaming_content), expected)
+
+    def test_viewset_stream_matches_response(self):
+        view = EnrollmentViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        responses = []
+        for url in ('/', '/?stream=true'):
+            request = factory.get(url)
+            force_authenticate(request, user=self.user)
+            responses.append(view(request))
+        expected = responses[0].render().content
+        self.assertEqual(b''.join(responses[1].streaming_content), expected)
+
+    def test_chunks_join_into_valid_json(self):
+        queryset = Enrollment.objects.for_listing()
+        context = {'request': APIRequestFactory().get('/')}
+        for chunk_size in (1, 5, 12, 100):
+            chunks = list(stream_json_list(queryset, EnrollmentSerializer, context, chunk_size=chunk_size))
+            body = json.loads(b''.join(chunks))
+            self.assertEqual([item['id'] for item in body['data']], list(queryset.values_list('pk', flat=True)))
+        empty = b''.join(stream_json_list(Enrollment.objects.none(), EnrollmentSerializer))
+        self.assertEqual(empty, b'{"data":[]}')
+
+
+class FastSerializerTests(QueryBudgetTestCase):
+    """Быстрые сериализаторы дают тот же JSON, что и сериализаторы DRF"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        plain = make_course('Курс "1"', description='', price='1234.5')
+        with_variants = make_course('Курс 2', price=100)
+        Course.objects.filter(pk=with_variants.pk).update(
+            img_variants={'small': 'courses/variants/a_small.jpg', 'medium.webp': 'courses/variants/a_medium.webp'},
+        )
+        no_image = make_course('Курс 3')
+        Course.objects.filter(pk=no_image.pk).update(img='')
+        for course, status in zip(Course.objects.order_by('pk'), ('pending', 'success', 'failed')):
+            Enrollment.objects.create(user=self.user, course=course, order_id=f'o{course.pk}', status=status)
+            Lesson.objects.create(course=course, name='Урок\u2028', text_content='Текст', hours=2)
+        Lesson.objects.create(course=plain, name='Видео', text_content='', hours=1,
+                              video_link='https://super-tube.cc/video/1')
+
+    def assertSameJSON(self, serializer_class, fast_class, queryset, query=''):
+        context = {'request': APIRequestFactory().get('/' + query)}
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, context=dict(context)).data)
+        for items in (queryset, fast_class.values(queryset)):
+            actual = JSONRenderer().render(fast_class(items, many=True, context=dict(context)).data)
+            self.assertEqual(actual, expected)
+
+    def test_courses(self):
+        for query in ('', '?img_size=small', '?img_format=webp', '?img_size=original'):
+            self.assertSameJSON(CourseSerializer, FastCourseSerializer, Course.objects.order_by('pk'), query)
+
+    def test_lessons(self):
+        self.assertSameJSON(LessonSerializer, FastLessonSerializer, Lesson.objects.order_by('pk'))
+
+    def test_enrollments(self):
+        self.assertSameJSON(EnrollmentSerializer, FastEnrollmentSerializer, Enrollment.objects.for_listing())
+
+    def test_single_object_and_empty_list(self):
+        course = Course.objects.first()
+        context = {'request': APIRequestFactory().get('/')}
+        self.assertEqual(FastCourseSerializer(course, context=context).data,
+                         CourseSerializer(course, context=context).data)
+        self.assertEqual(FastCourseSerializer([], many=True).data, [])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Чтение с реплики и read-your-writes на двух файлах SQLite"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.other = User.objects.create_user(username='st2@mail.ru', email='st2@mail.ru', password='Pass1_')
+        self.course = make_course()
+        self.snapshot_replica()
+        make_course('Новый курс')
+
+    def snapshot_replica(self):
+        """Копия основной БД во временный файл, на который указывает реплика"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        connections['default'].ensure_connection()
+        with sqlite3.connect(path) as target:
+            connections['default'].connection.backup(target)
+        target.close()
+
+        replica = connections['replica']
+        original = replica.settings_dict['NAME']
+        replica.close()
+        replica.settings_dict['NAME'] = path
+        self.addCleanup(replica.settings_dict.__setitem__, 'NAME', original)
+        self.addCleanup(replica.close)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {Token.objects.get_or_create(user=user)[0].key}')
+        return client
+
+    def course_names(self, client):
+        return [item['name'] for item in client.get('/school-api/courses/').json()['data']]
+
+    def test_reads_go_to_replica_until_own_write(self):
+        client = self.client_for(self.user)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.course_names(client), ['Курс'])
+        self.assertTrue(replica.captured_queries)
+
+        self.assertEqual(client.post(f'/school-api/courses/{self.course.pk}/buy/').status_code, 200)
+        self.assertEqual(len(client.get('/school-api/orders').json()['data']), 1)
+        self.assertEqual(self.course_names(client), ['Курс', 'Новый курс'])
+
+        other = self.client_for(self.other)
+        self.assertEqual(self.course_names(other), ['Курс'])
+
+    def test_writes_go_to_primary(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client_for(self.user).post(f'/school-api/courses/{self.course.pk}/buy/')
+        self.assertEqual(replica.captured_queries, [])
+        self.assertEqual(Enrollment.objects.using('default').count(), 1)
+
+    def test_statuses_and_paid_orders_are_read_from_primary(self):
+        client = self.client_for(self.user)
+        enrollment = Enrollment.objects.create(user=self.user, course=self.course, order_id='o1')
+        response = client.get('/school-api/courses/', {'with_status': 1}).json()
+        self.assertEqual([(c['name'], c['enrollment_status']) for c in response['data']], [('Курс', 'pending')])
+        self.assertEqual(client.get('/school-api/orders').json()['data'], [])
+
+        self.client.post('/school-api/payment-webhook', {'order_id': enrollment.order_id, 'status': 'success'})
+        self.assertTrue(sticky_users.is_sticky(self.user.pk))
+        self.assertEqual([o['payment_status'] for o in client.get('/school-api/orders').json()['data']], ['success'])
+        self.assertEqual(self.course_names(self.client_for(self.other)), ['Курс'])
+
+    def test_sticky_mark_is_shared_between_processes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config = {'BACKEND': 'api.cache.FileBackend', 'OPTIONS': {'location': directory.name}}
+        with override_settings(CATALOG_CACHE=config):
+            self.client_for(self.user).post(f'/school-api/courses/{self.course.pk}/buy/')
+            # Другой процесс: свой экземпляр кеша на том же хранилище.
+            with mock.patch('api.routing.catalog_cache', CatalogCache()):
+                self.assertTrue(sticky_users.is_sticky(self.user.pk))
+                self.assertFalse(sticky_users.is_sticky(self.other.pk))
+                self.assertEqual(len(self.client_for(self.user).get('/school-api/orders').json()['data']), 1)
+
+    def test_sticky_window_expires(self):
+        client = self.client_for(self.user)
+        with override_settings(REPLICA_ROUTING={'STICKY_SECONDS': 0}):
+            client.post(f'/school-api/courses/{self.course.pk}/buy/')
+            self.assertEqual(client.get('/school-api/orders').json()['data'], [])
+
+
+class EnrollmentAdminTests(TestCase):
+    """Список записей в админке: запросы не зависят от числа строк"""
+    url = '/course-admin/students/enrollment/'
+
+    def setUp(self):
+        admin = User.objects.create_superuser(username='admin@mail.ru', email='admin@mail.ru', password='Pass1_')
+        self.client.force_login(admin)
+        self.courses = [make_course(f'Курс {i}') for i in range(3)]
+
+    def add_enrollments(self, count):
+        start = User.objects.count()
+        users = User.objects.bulk_create(
+            User(username=f'st{i}@mail.ru', email=f'st{i}@mail.ru') for i in range(start, start + count)
+        )
+        Enrollment.objects.bulk_create(
+            Enrollment(user=user, course=self.courses[i % 3], order_id=f'order-{user.pk}')
+            for i, user in enumerate(users)
+        )
+
+    def changelist_queries(self, params=''):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
+
+    def test_query_count_does_not_grow(self):
+        self.add_enrollments(5)
+        _, small = self.changelist_queries()
+        self.add_enrollments(150)
+        response, large = self.changelist_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+        _, filtered = self.changelist_queries(f'?course={self.courses[0].pk}&status__exact=pending')
+        # + один запрос за названием выбранного курса для боковой панели
+        self.assertEqual(filtered, large + 1)
+
+    def test_exact_search_by_email_and_order(self):
+        self.add_enrollments(6)
+        enrollment = Enrollment.objects.select_related('user').last()
+        for query in (enrollment.user.email, enrollment.order_id):
+            response, _ = self.changelist_queries(f'?q={query}')
+            self.assertEqual([obj.pk for obj in response.context['cl'].result_list], [enrollment.pk])
+        response, _ = self.changelist_queries('?q=st')
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+    def test_course_filter_lists_only_selected_course(self):
+        self.add_enrollments(6)
+        response, _ = self.changelist_queries(f'?course={self.courses[1].pk}')
+        self.assertEqual({obj.course_id for obj in response.context['cl'].result_list}, {self.courses[1].pk})
+        self.assertContains(response, 'Курс 1')
+        self.assertNotContains(response, 'Курс 2')
+
+    def print_certificates(self, pks):
+        return self.client.post(self.url, {
+            'action': 'print_certificate', '_selected_action': [str(pk) for pk in pks],
+        })
+
+    def test_print_certificates_streams_issued_numbers(self):
+        self.add_enrollments(4)
+        enrollments = list(Enrollment.objects.order_by('pk'))
+        paid = enrollments[:3]
+        Enrollment.objects.filter(pk__in=[e.pk for e in paid]).update(status='success')
+        paid[0].certificate_number = certificate_registry.issue(paid[0])
+        User.objects.filter(pk=paid[1].user_id).update(first_name='Анна', last_name='<Иванова>')
+
+        response = self.print_certificates([e.pk for e in enrollments])
+        self.assertIsInstance(response, StreamingHttpResponse)
+        html = b''.join(response.streaming_content).decode()
+
+        numbers = dict(Enrollment.objects.filter(pk__in=[e.pk for e in paid])
+                       .values_list('pk', 'certificate_number'))
+        self.assertEqual(numbers[paid[0].pk], paid[0].certificate_number)
+        self.assertEqual(len(set(numbers.values())), 3)
+        self.assertTrue(all(is_well_formed(number) for number in numbers.values()))
+        self.assertIsNone(Enrollment.objects.get(pk=enrollments[3].pk).certificate_number)
+        self.assertEqual(html.count('class="certificate"'), 3)
+        positions = [html.index(numbers[e.pk]) for e in paid]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn('Анна &lt;Иванова&gt;', html)
+        self.assertTrue(html.rstrip().endswith('</html>'))
+
+        # Повторная печать не перевыпускает номера.
+        self.print_certificates([e.pk for e in paid])
+        self.assertEqual(dict(Enrollment.objects.filter(pk__in=numbers).values_list('pk', 'certificate_number')),
+                         numbers)
+
+    def test_print_certificates_requires_paid_enrollments(self):
+        self.add_enrollments(2)
+        response = self.print_certificates(Enrollment.objects.values_list('pk', flat=True))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Enrollment.objects.exclude(certificate_number=None).exists())
+
+    def test_paginator_caps_count(self):
+        self.add_enrollments(12)
+        paginator = EstimatedCountPaginator(Enrollment.objects.order_by('pk'), 5)
+        paginator.max_count = 10
+        self.assertEqual(paginator.count, 10)
+        self.assertEqual(paginator.num_pages, 2)
+        paginator = EstimatedCountPaginator(Enrollment.objects.order_by('pk'), 5, page_number=2)
+        paginator.max_count = 10
+        self.assertEqual(paginator.count, 12)
+        self.assertEqual(len(paginator.page(3)), 2)
+
+    def test_pages_past_cap_are_reachable(self):
+        self.add_enrollments(12)
+        with mock.patch.object(EstimatedCountPaginator, 'max_count', 10), \
+                mock.patch.object(EnrollmentAdmin, 'list_per_page', 5):
+            response, _ = self.changelist_queries('?p=2')
+            self.assertEqual(response.context['cl'].result_count, 12)
+            response, _ = self.changelist_queries('?p=3')
+            self.assertEqual(len(response.context['cl'].result_list), 2)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTests(TestCase):
+    """Горячие запросы идут по индексам, а не полным просмотром таблиц"""
+
+    def assertUsesIndex(self, queryset):
+        if isinstance(queryset, RawQuerySet):
+            sql, params = queryset.raw_query, queryset.params
+        else:
+            sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        # Виртуальная таблица FTS5 с MATCH читается через свой индекс.
+        scans = [step for step in plan if step.startswith('SCAN ') and 'VIRTUAL TABLE INDEX' not in step]
+        self.assertFalse(scans, f'Полный просмотр таблицы:\n{sql}\n' + '\n'.join(plan))
+
+    def test_hot_queries(self):
+        today = datetime.date.today()
+        queries = {
+            'вебхук оплаты': Enrollment.objects.filter(order_id='o1').exclude(status='success'),
+            'пакет событий оплаты': PaymentEvent.objects.filter(processed_at__isnull=True).order_by('pk')[:500],
+            'проверка сертификата': Enrollment.objects.filter(certificate_number='1' * 16).values('pk')[:1],
+            'покупка курса': Enrollment.objects.filter(user_id=1, course_id=1),
+            'список заказов': Enrollment.objects.for_listing().filter(user_id=1),
+            'уроки курса': Lesson.objects.filter(course_id=1).order_by('pk'),
+            'курсы с открытой записью': Course.objects.available(today),
+            'токен': Token.objects.select_related('user').filter(key='k'),
+            'вход по email': User.objects.filter(email='st@mail.ru'),
+            'поиск курсов': search_courses('python', 5),
+            'брошенные записи': Enrollment.objects.filter(status__in=('pending', 'failed'), date__lt=timezone.now()),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(name):
+                self.assertUsesIndex(queryset)
+
+    def test_full_scan_is_detected(self):
+        with self.assertRaises(AssertionError):
+            self.assertUsesIndex(Enrollment.objects.filter(order_id__icontains='o1'))
+
+
+class EnrollmentReaperTests(TestCase):
+    """Очистка брошенных неоплаченных записей"""
+
+    def setUp(self):
+        self.courses = [make_course(f'Курс {i}') for i in range(6)]
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.old = timezone.now() - datetime.timedelta(days=30)
+
+    def add(self, course, status, date=None):
+        enrollment = Enrollment.objects.create(user=self.user, course=course, status=status, order_id=f'o{course.pk}')
+        if date:
+            Enrollment.objects.filter(pk=enrollment.pk).update(date=date)
+        return enrollment
+
+    def test_archives_only_old_unpaid(self):
+        pending = self.add(self.courses[0], 'pending', self.old)
+        failed = self.add(self.courses[1], 'failed', self.old)
+        paid = self.add(self.courses[2], 'success', self.old)
+        fresh = self.add(self.courses[3], 'pending')
+        self.assertEqual(reap_enrollments(7), 2)
+        self.assertEqual(set(Enrollment.objects.values_list('pk', flat=True)), {paid.pk, fresh.pk})
+        archived = ArchivedEnrollment.objects.order_by('enrollment_id')
+        self.assertEqual(
+            list(archived.values_list('enrollment_id', 'status', 'order_id')),
+            [(pending.pk, 'pending', pending.order_id), (failed.pk, 'failed', failed.order_id)],
+        )
+
+    def test_batches_are_short_transactions(self):
+        for course in self.courses[:5]:
+            self.add(course, 'pending', self.old)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(reap_enrollments(7, BATCH_SIZE=2, PAUSE=0, ARCHIVE=False), 5)
+        deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertFalse(ArchivedEnrollment.objects.exists())
+
+    def test_new_checkout_resets_age(self):
+        enrollment = self.add(self.courses[0], 'failed', self.old)
+        enroll(self.user, self.courses[0])
+        self.assertEqual(reap_enrollments(7), 0)
+        self.assertTrue(Enrollment.objects.filter(pk=enrollment.pk).exists())
+
+    def test_command(self):
+        self.add(self.courses[0], 'pending', self.old)
+        out = StringIO()
+        call_command('reap_enrollments', '--days', '10', '--no-archive', stdout=out)
+        self.assertIn('Удалено записей: 1', out.getvalue())
+        self.assertFalse(ArchivedEnrollment.objects.exists())
+
+
+class EnrollmentReaperThreadTests(TransactionTestCase):
+    """Фоновый поток очистки"""
+
+    def test_thread_reaps_periodically(self):
+        user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        enrollment = Enrollment.objects.create(user=user, course=make_course(), order_id='o1')
+        Enrollment.objects.filter(pk=enrollment.pk).update(date=timezone.now() - datetime.timedelta(days=30))
+        with override_settings(ENROLLMENT_REAPER={'INTERVAL': 0.05}):
+            thread = start_reaper()
+            self.addCleanup(stop_reaper)
+            self.assertIs(start_reaper(), thread)
+            for _ in range(100):
+                if not Enrollment.objects.exists():
+                    break
+                time.sleep(0.05)
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertEqual(ArchivedEnrollment.objects.get().order_id, 'o1')
+        self.assertIsNone(start_reaper())
+
+    def test_loop_runs_only_from_command(self):
+        self.assertNotIn('enrollment-reaper', [thread.name for thread in threading.enumerate()])
+        with mock.patch('students.reaper.ReaperThread.run', autospec=True) as run:
+            call_command('reap_enrollments', '--loop', '--interval', '5', '--days', '3', stdout=StringIO())
+        reaper = run.call_args.args[0]
+        self.assertEqual(reaper.interval, 5)
+        self.assertEqual(reaper.options['max_age_days'], 3)
+        with self.assertRaises(CommandError):
+            call_command('reap_enrollments', '--loop', stdout=StringIO())
@@ -1 +1,111 @@
-from django.test import TestCase
\ No newline at end of file
+import threading
+from unittest import mock
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from api.authentication import TokenCache, token_cache
+from api.exceptions import ServiceUnavailable
+from api.hashing import HashingExecutor
+from api.testing import QueryBudgetTestCase
+from .models import User
+
+
+class CachedTokenAuthenticationTests(QueryBudgetTestCase):
+    """Кеш токенов: без запросов к БД в установившемся режиме"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='st@mail.ru', email='st@mail.ru', password='Pass1_')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.key}')
+
+    def test_cached_request_skips_auth_query(self):
+        hits = token_cache.stats()['hits']
+        with CaptureQueriesContext(connection) as first:
+            self.client.get('/school-api/orders')
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get('/school-api/orders')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(second), len(first) - 1)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+    def test_deactivated_user_is_evicted(self):
+        self.client.get('/school-api/orders')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/school-api/orders').status_code, 401)
+
+    def test_deleted_token_is_evicted(self):
+        self.client.get('/school-api/orders')
+        self.token.delete()
+        self.assertEqual(self.client.get('/school-api/orders').status_code, 401)
+
+    def test_cache_is_bounded(self):
+        cache = TokenCache(max_size=2, ttl=60)
+        for i in range(3):
+            cache.put(f'key{i}', self.user, None)
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 2)
+
+
+class PasswordHashingTests(QueryBudgetTestCase):
+    """Регистрация и вход с хешированием в ограниченном пуле"""
+
+    def test_register_and_login(self):
+        response = self.client.post('/school-api/registr', {'email': 'new@mail.ru', 'password': 'Pass1_'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(check_password('Pass1_', User.objects.get(email='new@mail.ru').password))
+
+        response = self.assertWithinQueryBudget('post', '/school-api/auth', {'email': 'new@mail.ru', 'password': 'Pass1_'}, format='json')
+        self.assertIn('token', response.json())
+        response = self.client.post('/school-api/auth', {'email': 'new@mail.ru', 'password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post('/school-api/auth', {'email': 'no@mail.ru', 'password': 'Pass1_'}, format='json')
+        self.assertEqual(response.status_code, 422)
+
+    async def test_async_login(self):
+        await User.objects.acreate(username='a@mail.ru', email='a@mail.ru', password=make_password('Pass1_'))
+        response = await self.async_client.post(
+            '/school-api/async/auth', {'email': 'a@mail.ru', 'password': 'Pass1_'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.json())
+
+    def test_login_goes_through_authenticate(self):
+        User.objects.create_user(username='a@mail.ru', email='a@mail.ru', password='Pass1_')
+        failed = []
+        user_login_failed.connect(lambda **kwargs: failed.append(kwargs['credentials']['username']),
+                                  weak=False, dispatch_uid='test-login-failed')
+        self.addCleanup(user_login_failed.disconnect, dispatch_uid='test-login-failed')
+        with mock.patch('api.hashing.HashingExecutor.run', autospec=True,
+                        side_effect=lambda executor, fn, *args: fn(*args)) as run:
+            self.client.post('/school-api/auth', {'email': 'a@mail.ru', 'password': 'wrong'}, format='json')
+        self.assertTrue(run.called)
+        self.assertEqual(failed, ['a@mail.ru'])
+
+        with self.settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.AllowAllUsersModelBackend']):
+            with mock.patch('api.hashing.HashingExecutor.run') as run:
+                response = self.client.post('/school-api/auth', {'email': 'a@mail.ru', 'password': 'Pass1_'},
+                                            format='json')
+        self.assertIn('token', response.json())
+        self.assertFalse(run.called)
+
+    def test_full_pool_rejects_immediately(self):
+        executor = HashingExecutor(workers=1, max_pending=1)
+        release = threading.Event()
+        executor.submit(release.wait)
+        executor.submit(release.wait)
+        with self.assertRaises(ServiceUnavailable):
+            executor.submit(release.wait)
+        release.set()
+        executor.shutdown()
+        self.assertEqual(executor.stats()['rejected'], 1)
+
+    def test_overload_returns_503(self):
+        with mock.patch('api.hashing.HashingExecutor.submit', side_effect=ServiceUnavailable):
+            response = self.client.post('/school-api/auth', {'email': 'a@mail.ru', 'password': 'Pass1_'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')